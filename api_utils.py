@@ -4,25 +4,85 @@ API utility functions for OpenRouter and LLM interactions.
 import os
 import io
 import base64
+import hashlib
+import math
+import threading
+import time
 import streamlit as st
 from openai import OpenAI
 from PIL import Image
 import config
+from cache_utils import LRUCache
 
 
-def get_openrouter_client():
-    """Get OpenRouter API client."""
-    api_key = config.OPENROUTER_API_KEY
+def create_openrouter_client(base_url=None, api_key=None):
+    """
+    Create an OpenRouter API client, or return None if no API key is configured.
+
+    Args:
+        base_url: API endpoint (defaults to config.OPENROUTER_BASE_URL, e.g. a local stub for tests)
+        api_key: API key (defaults to config.OPENROUTER_API_KEY)
+    """
+    api_key = api_key or config.OPENROUTER_API_KEY
     if not api_key:
-        st.error("OpenRouter API key not found. Please set OPENROUTER_API_KEY in .env file, environment variable, or Streamlit secrets.")
         return None
     
     return OpenAI(
-        base_url=config.OPENROUTER_BASE_URL,
+        base_url=base_url or config.OPENROUTER_BASE_URL,
         api_key=api_key,
     )
 
 
+def get_openrouter_client():
+    """Get OpenRouter API client."""
+    client = create_openrouter_client()
+    if client is None:
+        st.error("OpenRouter API key not found. Please set OPENROUTER_API_KEY in .env file, environment variable, or Streamlit secrets.")
+    return client
+
+
+def build_transcription_messages(img_base64, prompt=None):
+    """Build the chat messages asking the vision model to transcribe a highlighted crop."""
+    return [
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": prompt if prompt is not None else config.PROMPT_IMAGE
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{img_base64}"
+                    }
+                }
+            ]
+        }
+    ]
+
+
+def request_transcription(client, img_base64, model=None, temperature=None):
+    """
+    Ask the vision model to transcribe the highlighted text of an encoded crop.
+
+    Args:
+        client: OpenAI-compatible client (see get_openrouter_client)
+        img_base64: Base64 encoded JPEG crop (see encode_image_for_vision)
+        model: Model name (defaults to config.DEFAULT_VISION_MODEL)
+        temperature: Sampling temperature (defaults to config.LLM_TEMPERATURE)
+
+    Returns:
+        str: The transcribed text
+    """
+    response = client.chat.completions.create(
+        model=model or config.DEFAULT_VISION_MODEL,
+        messages=build_transcription_messages(img_base64),
+        temperature=config.LLM_TEMPERATURE if temperature is None else temperature,
+    )
+    return response.choices[0].message.content.strip()
+
+
 def encode_image_to_base64(image):
     """Convert PIL Image to base64 encoded string for API transmission."""
     buffered = io.BytesIO()
@@ -39,3 +99,122 @@ def encode_image_to_base64(image):
     image.save(buffered, format="JPEG")
     return base64.b64encode(buffered.getvalue()).decode('utf-8')
 
+
+# Encoded vision payloads: {(crop hash, settings): base64 string}
+_vision_payload_cache = LRUCache(config.VISION_ENCODE_CACHE_ENTRIES)
+_encoding_stats_lock = threading.Lock()
+_encoding_stats = {
+    'crops': 0,
+    'cache_hits': 0,
+    'downsampled': 0,
+    'input_pixels': 0,
+    'output_pixels': 0,
+    'payload_bytes': 0,
+    'encode_seconds': 0.0,
+}
+
+
+def _to_rgb(image):
+    """Flatten an image to RGB on a white background (JPEG doesn't support transparency)."""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+        rgb_image.paste(image, mask=image.split()[-1])
+        return rgb_image
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def _vision_settings():
+    return (config.VISION_MAX_PIXELS, config.VISION_GRAYSCALE,
+            tuple(config.VISION_JPEG_QUALITIES), config.VISION_TARGET_BYTES)
+
+
+def encode_image_for_vision(image):
+    """
+    Encode a crop as the base64 JPEG payload sent to the vision model.
+
+    Crops larger than config.VISION_MAX_PIXELS are downsampled to that pixel budget,
+    optionally converted to grayscale (config.VISION_GRAYSCALE), and encoded with the
+    highest quality of config.VISION_JPEG_QUALITIES whose payload fits
+    config.VISION_TARGET_BYTES. Results are memoized by the hash of the crop pixels,
+    and every call is recorded in the encoding stats (see get_encoding_stats).
+
+    Args:
+        image: PIL Image
+
+    Returns:
+        str: Base64 encoded JPEG
+    """
+    start = time.perf_counter()
+    settings = _vision_settings()
+    digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+    digest.update(f"{image.mode}{image.size}".encode('ascii'))
+    key = (digest.hexdigest(), settings)
+
+    encoded = _vision_payload_cache.get(key)
+    if encoded is not None:
+        _record_encoding(cache_hit=True, seconds=time.perf_counter() - start)
+        return encoded
+
+    max_pixels, grayscale, qualities, target_bytes = settings
+    input_pixels = image.width * image.height
+    image = _to_rgb(image)
+    if max_pixels and input_pixels > max_pixels:
+        scale = math.sqrt(max_pixels / input_pixels)
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+    if grayscale:
+        image = image.convert('L')
+
+    for quality in qualities:
+        buffered = io.BytesIO()
+        image.save(buffered, format="JPEG", quality=quality, optimize=True)
+        if buffered.tell() <= target_bytes:
+            break
+    payload = buffered.getvalue()
+    encoded = base64.b64encode(payload).decode('utf-8')
+    _vision_payload_cache.put(key, encoded)
+    _record_encoding(
+        cache_hit=False, seconds=time.perf_counter() - start, input_pixels=input_pixels,
+        output_pixels=image.width * image.height, payload_bytes=len(payload)
+    )
+    return encoded
+
+
+def _record_encoding(cache_hit, seconds, input_pixels=0, output_pixels=0, payload_bytes=0):
+    with _encoding_stats_lock:
+        _encoding_stats['crops'] += 1
+        _encoding_stats['encode_seconds'] += seconds
+        if cache_hit:
+            _encoding_stats['cache_hits'] += 1
+            return
+        _encoding_stats['downsampled'] += output_pixels < input_pixels
+        _encoding_stats['input_pixels'] += input_pixels
+        _encoding_stats['output_pixels'] += output_pixels
+        _encoding_stats['payload_bytes'] += payload_bytes
+
+
+def get_encoding_stats():
+    """
+    Return the vision payload encoding stats since the last reset.
+
+    Returns:
+        dict: Counters (crops, cache_hits, downsampled, input/output pixels, payload bytes,
+              encode seconds) plus the average payload size and encoding time per encoded crop
+    """
+    with _encoding_stats_lock:
+        stats = dict(_encoding_stats)
+    encoded = stats['crops'] - stats['cache_hits']
+    stats['avg_payload_bytes'] = stats['payload_bytes'] / encoded if encoded else 0
+    stats['avg_encode_ms'] = stats['encode_seconds'] * 1000 / stats['crops'] if stats['crops'] else 0
+    return stats
+
+
+def reset_encoding_stats():
+    """Reset the vision payload encoding stats."""
+    with _encoding_stats_lock:
+        for name in _encoding_stats:
+            _encoding_stats[name] = 0.0 if name == 'encode_seconds' else 0
@@ -2,20 +2,27 @@ import streamlit as st
 import streamlit.components.v1 as components
 from pathlib import Path
 from PIL import Image
-import pandas as pd
 import io
-from parser import parse_mmd_file
-from database import init_db, insert_error, get_errors, delete_error
+import base64
+import concurrent.futures
+from document_store import get_document
+from database import init_db, insert_error, get_page_errors, get_recent_errors, delete_error
 from loguru import logger
 import config
-from api_utils import get_openrouter_client, encode_image_to_base64
-from text_utils import is_table, count_words, count_differing_words
-from document_utils import parse_doc_name, get_documents_data
-from image_utils import load_pdf_page_as_image, crop_and_highlight_bbox
+from api_utils import encode_image_to_base64
+from text_utils import is_table
+from document_utils import parse_doc_name, get_corpus_catalog
+from image_utils import load_pdf_page_as_image, get_bbox_crop
+from prefetch_utils import prefetch_next_bboxes
+from tile_store import load_tile, load_bbox_crop
+from metrics import get_annotation_metrics, get_page_metrics
+from rule_engine import apply_rules
+from suggestions import get_bbox_suggestion, find_next_suggestion, SOURCE_LLM, SOURCE_RULES
+from llm_service import get_correction_service, STATUS_DONE, STATUS_ERROR
 
 # Load environment variables from .env file
 
-# Initialize database
+# Initialize database (schema migrations run once per process, later reruns return immediately)
 init_db()
 
 # Page config
@@ -69,6 +76,7 @@ def check_password():
                 logger.info(f"Config.AUTH_USERNAME: {config.AUTH_USERNAME}, Config.AUTH_PASSWORD: {config.AUTH_PASSWORD}")
                 if username == config.AUTH_USERNAME and password == config.AUTH_PASSWORD:
                     st.session_state["password_correct"] = True
+                    st.session_state["username"] = username
                     # Clear login form keys
                     if "login_username" in st.session_state:
                         del st.session_state["login_username"]
@@ -106,6 +114,9 @@ if "last_bbox_id" not in st.session_state:
 
 if "temp_text" not in st.session_state:
     st.session_state.temp_text = None
+# Background corrections this session asked for with "Aplicar Correções": {(document, page, bbox): rules}
+if "llm_requests" not in st.session_state:
+    st.session_state.llm_requests = {}
 
 if "button_accept" not in st.session_state:
     st.session_state.button_accept = None
@@ -121,26 +132,33 @@ if "previous_page" not in st.session_state:
 
 # Text processing functions are now imported from text_utils
 
-# Get all documents from year folders
+
+@st.fragment(run_every=config.LLM_POLL_INTERVAL)
+def poll_llm_correction(llm_key):
+    """Rerun the app as soon as the background correction of the current box finishes."""
+    llm_result = get_correction_service().get(llm_key)
+    if llm_result is None or llm_result['status'] in (STATUS_DONE, STATUS_ERROR):
+        st.rerun()
+    st.info("⏳ Correção inteligente em curso... pode continuar a trabalhar noutras caixas.")
+
+
+# Get all documents from year folders (cached catalog, refreshed incrementally)
 parsed_docs_dir = config.PARSED_DOCS_DIR
-year_dirs = sorted([d for d in parsed_docs_dir.iterdir() if d.is_dir()])
+catalog = get_corpus_catalog()
 
-if not year_dirs:
+if not catalog.year_dirs():
     st.error("Nenhum diretório de documentos encontrado em parsed_docs/")
     st.stop()
 
-# Extract all documents from year folders
-documents_data = get_documents_data()
+# Get unique years, months, days
+all_years = catalog.years()
+all_months = catalog.months()
+all_days = catalog.days()
 
-if not documents_data:
+if not all_years:
     st.error("Nenhum documento válido encontrado")
     st.stop()
 
-# Get unique years, months, days
-all_years = sorted(set(d['year'] for d in documents_data))
-all_months = sorted(set(d['month'] for d in documents_data))
-all_days = sorted(set(d['day'] for d in documents_data))
-
 # Navigation buttons in sidebar
 if "current_view" not in st.session_state:
     st.session_state.current_view = "anotacao"
@@ -176,9 +194,8 @@ selected_year = st.sidebar.selectbox(
     key="year_select"
 )
 
-# Filter documents by year
-filtered_by_year = [d for d in documents_data if d['year'] == selected_year]
-available_months = sorted(set(d['month'] for d in filtered_by_year))
+# Months with documents in the selected year
+available_months = catalog.months(selected_year)
 
 # Month dropdown with month names
 if available_months:
@@ -197,10 +214,9 @@ else:
     selected_month = None
     st.sidebar.warning("Nenhum mês disponível para o ano selecionado")
 
-# Filter documents by year and month
+# Days with documents in the selected year and month
 if selected_month:
-    filtered_by_month = [d for d in filtered_by_year if d['month'] == selected_month]
-    available_days = sorted(set(d['day'] for d in filtered_by_month))
+    available_days = catalog.days(selected_year, selected_month)
     
     # Day dropdown
     if available_days:
@@ -223,9 +239,8 @@ else:
 # Find the matching document
 selected_doc = None
 if selected_year and selected_month and selected_day:
-    matching_docs = [d for d in documents_data if d['year'] == selected_year and d['month'] == selected_month and d['day'] == selected_day]
-    if matching_docs:
-        selected_doc = matching_docs[0]
+    selected_doc = catalog.get(selected_year, selected_month, selected_day)
+    if selected_doc:
         selected_dir = selected_doc['path']  # Year folder
         document_name = selected_doc['name']  # Document name (DR_DD_MM_YYYY)
         # For database operations, use the year (to match existing database format)
@@ -250,29 +265,30 @@ if not pdf_path.exists() or not mmd_path.exists():
     st.error(f"Ficheiros PDF ou MMD em falta para {document_name}")
     st.stop()
 
-# Parse MMD file
-if 'parsed_data' not in st.session_state or st.session_state.get('current_doc') != document_name:
-    with st.spinner("A processar ficheiro MMD..."):
-        st.session_state.parsed_data = parse_mmd_file(str(mmd_path))
-        st.session_state.current_doc = document_name
-
-parsed_data = st.session_state.parsed_data
+# Shared, read-only parsed document (one copy per process, not per session)
+with st.spinner("A processar ficheiro MMD..."):
+    document = get_document(mmd_path)
 
 # Page selection
-pages = sorted(parsed_data.keys())
+pages = list(document.page_numbers)
 if not pages:
     st.error("Nenhuma página encontrada no ficheiro MMD")
     st.stop()
 
-# Get current page index or default to 0
-current_page_index = 0
-if st.session_state.previous_page and st.session_state.previous_page in pages:
-    current_page_index = pages.index(st.session_state.previous_page)
+# The page widget takes its value from st.session_state.page_select only (passing index= as well
+# makes Streamlit warn), so set it before the widget is created: the page of a jump requested by
+# "Próxima sugestão", else the previous page, or the first page when it is not in this document
+if st.session_state.get("jump_to_suggestion"):
+    st.session_state.page_select = st.session_state.jump_to_suggestion[0]
+elif st.session_state.get("page_select") not in pages:
+    if st.session_state.previous_page in pages:
+        st.session_state.page_select = st.session_state.previous_page
+    else:
+        st.session_state.page_select = pages[0]
 
 selected_page = st.sidebar.selectbox(
     "Página",
     options=pages,
-    index=current_page_index,
     key="page_select"
 )
 
@@ -298,6 +314,7 @@ if sidebar_changed:
     # Reset bbox to 1 and clear text state
     st.session_state.bbox_num = 1
     st.session_state.temp_text = None
+    st.session_state.llm_requests = {}
     if "ground_truth" in st.session_state:
         st.session_state["ground_truth"] = None
     st.session_state.last_bbox_id = None
@@ -332,13 +349,18 @@ if sidebar_changed:
     st.session_state.previous_page = selected_page
     logger.info("Sidebar changed")
 
-# Get bounding boxes for selected page
-bboxes_data = parsed_data[selected_page]
+# Get bounding boxes for selected page (a reference into the shared document)
+bboxes_data = document.page(selected_page)
 
 # Initialize bbox_num in session state if not exists
 if 'bbox_num' not in st.session_state:
     st.session_state.bbox_num = 1
 
+# Finish a "Próxima sugestão" jump now that the page change has reset the bbox
+if st.session_state.get("jump_to_suggestion"):
+    st.session_state.bbox_num = st.session_state.jump_to_suggestion[1]
+    st.session_state.jump_to_suggestion = None
+
 # Bounding box number input in sidebar
 logger.info(f"Bbox num: {st.session_state.bbox_num}")
 st.sidebar.number_input(
@@ -350,12 +372,31 @@ st.sidebar.number_input(
 )
 logger.info(f"Bbox num after input: {st.session_state.bbox_num}")
 
-# Load PDF page as image
-try:
-    img, img_metadata = load_pdf_page_as_image(pdf_path, selected_page)
-except Exception as e:
-    st.error(f"Erro ao carregar PDF: {e}")
-    st.stop()
+# Jump to the next box where the precomputed rule suggestions changed the text (see suggestions.py)
+if st.sidebar.button("⏭️ Próxima sugestão (Regras)", use_container_width=True, key="next_rule_suggestion"):
+    next_suggestion = find_next_suggestion(document, document_name, selected_page, st.session_state.bbox_num)
+    if next_suggestion:
+        st.session_state.jump_to_suggestion = next_suggestion
+        st.rerun()
+    else:
+        st.sidebar.info("Não existem mais sugestões das regras neste documento")
+
+# Queue the intelligent correction of every box of the page; results arrive in the background
+correction_service = get_correction_service()
+page_llm_keys = [(document_name, selected_page, bbox_number) for bbox_number in range(1, len(bboxes_data) + 1)]
+if st.sidebar.button("🤖 Corrigir página (Inteligente)", use_container_width=True, key="queue_page_llm"):
+    queued = 0
+    for (bbox, bbox_text), llm_key in zip(bboxes_data, page_llm_keys):
+        if not is_table(bbox_text):
+            if correction_service.submit(llm_key, lambda bbox=bbox: load_bbox_crop(pdf_path, selected_page, bbox)):
+                queued += 1
+    st.sidebar.success(f"{queued} caixas enviadas para correção inteligente")
+page_llm_results = correction_service.get_many(page_llm_keys)
+if page_llm_results:
+    llm_done = sum(1 for result in page_llm_results.values() if result['status'] == STATUS_DONE)
+    llm_pending = sum(1 for result in page_llm_results.values()
+                      if result['status'] not in (STATUS_DONE, STATUS_ERROR))
+    st.sidebar.caption(f"Correção inteligente: {llm_done} concluídas, {llm_pending} em curso")
 
 # Check for navigation actions that need to happen before widgets are created
 # This prevents the "cannot modify after widget instantiated" error
@@ -371,10 +412,29 @@ if st.session_state.current_view == "anotacao":
     current_bbox, _ = bboxes_data[current_bbox_num - 1] if current_bbox_num <= len(bboxes_data) else (None, None)
 
     # Crop image to show only the selected bounding box
-    if current_bbox:
-        display_img = crop_and_highlight_bbox(img, current_bbox, img_metadata)
-    else:
-        display_img = img
+    # Serve the precomputed tile when the document has been tiled (see tile_store.py)
+    display_tile = load_tile(pdf_path, selected_page, current_bbox) if current_bbox else None
+    try:
+        if display_tile:
+            display_img = Image.open(io.BytesIO(display_tile[0]))
+        elif current_bbox:
+            display_img = get_bbox_crop(pdf_path, selected_page, current_bbox)
+        else:
+            # Only a page without boxes needs the full page raster
+            display_img, _ = load_pdf_page_as_image(pdf_path, selected_page)
+    except Exception as e:
+        st.error(f"Erro ao carregar PDF: {e}")
+        st.stop()
+    
+    # Prepare the next boxes (and the next page) while this one is annotated
+    next_page_index = pages.index(selected_page) + 1
+    prefetch_next_bboxes(
+        pdf_path,
+        selected_page,
+        [bbox for bbox, _ in bboxes_data],
+        current_bbox_num,
+        next_page=pages[next_page_index] if next_page_index < len(pages) else None
+    )
     
     # Get the text for selected bounding box - use current session state value
     selected_bbox_text = bboxes_data[current_bbox_num - 1][1] if current_bbox_num <= len(bboxes_data) else ""
@@ -400,9 +460,15 @@ if st.session_state.current_view == "anotacao":
         else:
             st.subheader(f"Pagina {selected_page} - Caixa {current_bbox_num}")
         # Convert PIL Image to base64 and embed directly in HTML to bypass Streamlit's media storage
-        img_base64 = encode_image_to_base64(display_img)
+        if display_tile:
+            # Tiles are already encoded, embed their bytes as they are
+            tile_data, tile_mime = display_tile
+            img_base64 = base64.b64encode(tile_data).decode('utf-8')
+        else:
+            tile_mime = "image/jpeg"
+            img_base64 = encode_image_to_base64(display_img)
         st.markdown(
-            f'<img src="data:image/jpeg;base64,{img_base64}" style="width:100%; height:auto;" />',
+            f'<img src="data:{tile_mime};base64,{img_base64}" style="width:100%; height:auto;" />',
             unsafe_allow_html=True
         )
 
@@ -462,6 +528,10 @@ if st.session_state.current_view == "anotacao":
             st.session_state[f"ferramentas_correcao_inteligente_{current_bbox_num}"] = correcao_inteligente
             st.session_state[f"ferramentas_correcao_regras_{current_bbox_num}"] = correcao_regras
             
+            # Background intelligent correction of this box (queued here or for the whole page)
+            llm_key = (document_name, selected_page, current_bbox_num)
+            llm_result = correction_service.get(llm_key)
+            
             if apply_button:
                 if correcao_inteligente or correcao_regras:
                     # Start with current text
@@ -470,58 +540,25 @@ if st.session_state.current_view == "anotacao":
                     else:
                         working_text = st.session_state["ground_truth"]
                     
-                    # Apply intelligent correction first if selected
+                    # Intelligent correction runs in the background; the rules are applied to its result
+                    # when it arrives (see below), so the UI is never blocked by the API.
+                    # A result that is already there (queued for the page or by another session) is reused.
+                    if correcao_inteligente and not (llm_result and llm_result['status'] == STATUS_DONE):
+                        st.session_state.llm_requests[llm_key] = correcao_regras
+                        llm_future = correction_service.submit(
+                            llm_key, lambda: load_bbox_crop(pdf_path, selected_page, current_bbox)
+                        )
+                        if llm_future is not None:
+                            # Cached transcriptions come back right away; anything slower is polled
+                            concurrent.futures.wait([llm_future], timeout=config.LLM_SUBMIT_WAIT_SECONDS)
+                        st.rerun()
                     if correcao_inteligente:
-                        client = get_openrouter_client()
-                        if client is not None:
-                            try:
-                                # Convert image to base64
-                                img_base64 = encode_image_to_base64(display_img)
-                                
-                                with st.spinner("A processar..."):
-                                    # Call OpenRouter API with image (using vision model)
-                                    response = client.chat.completions.create(
-                                        model=config.DEFAULT_VISION_MODEL,
-                                        messages=[
-                                            {
-                                                "role": "user",
-                                                "content": [
-                                                    {
-                                                        "type": "text",
-                                                        "text": config.PROMPT_IMAGE
-                                                    },
-                                                    {
-                                                        "type": "image_url",
-                                                        "image_url": {
-                                                            "url": f"data:image/jpeg;base64,{img_base64}"
-                                                        }
-                                                    }
-                                                ]
-                                            }
-                                        ],
-                                        temperature=config.LLM_TEMPERATURE,
-                                    )
-                                    
-                                    # Extract text from response
-                                    llm_corrected_text = response.choices[0].message.content.strip()
-                                    logger.info(f"Texto obtido com LLM: {llm_corrected_text}")
-                                    
-                                    # Store in session state
-                                    st.session_state[f"llm_corrected_text_{current_bbox_num}"] = llm_corrected_text
-                                    
-                                    # Use corrected text for further processing
-                                    working_text = llm_corrected_text
-                            except Exception as e:
-                                st.error(f"Erro ao processar imagem com LLM: {str(e)}")
-                                logger.error(f"Erro ao processar imagem com LLM: {str(e)}")
-                                st.exception(e)
-                        else:
-                            st.error("OpenRouter API key não encontrada")
+                        working_text = llm_result['text']
+                        st.session_state[f"llm_corrected_text_{current_bbox_num}"] = llm_result['text']
                     
                     # Apply rules correction if selected
                     if correcao_regras:
-                        for old, new in config.RULES_DICT.items():
-                            working_text = working_text.replace(old, new)
+                        working_text = apply_rules(working_text)
                         logger.info(f"Working text after rule correction: {working_text}")
                     
                     # Store the combined correction result for display in "Sugestão de Correção"
@@ -537,6 +574,34 @@ if st.session_state.current_view == "anotacao":
             # Display combined correction suggestion if available
             combined_correction_key = f"combined_correction_{current_bbox_num}"
             
+            # Show the background correction as a suggestion once it arrives. A result this session
+            # requested always fills "Texto Corrigido", like an Apply that finished at once; results are
+            # shared by every session, so one nobody here requested only fills it while it is still empty.
+            if llm_result and llm_result['status'] == STATUS_DONE:
+                if st.session_state.get(f"llm_corrected_text_{current_bbox_num}") != llm_result['text']:
+                    st.session_state[f"llm_corrected_text_{current_bbox_num}"] = llm_result['text']
+                    requested = llm_key in st.session_state.llm_requests
+                    with_rules = st.session_state.llm_requests.pop(llm_key, correcao_regras)
+                    working_text = apply_rules(llm_result['text']) if with_rules else llm_result['text']
+                    st.session_state[combined_correction_key] = working_text
+                    if requested or st.session_state.temp_text is None:
+                        st.session_state.temp_text = working_text
+            elif llm_result and llm_result['status'] == STATUS_ERROR:
+                st.session_state.llm_requests.pop(llm_key, None)
+                st.error(f"Erro ao processar imagem com LLM: {llm_result['error']}")
+            elif llm_result:
+                poll_llm_correction(llm_key)
+            
+            # Prefill with the precomputed suggestions (pretranscribe.py, then suggestions.py) when they change this box
+            if combined_correction_key not in st.session_state:
+                for suggestion_source in (SOURCE_LLM, SOURCE_RULES):
+                    stored_suggestion = get_bbox_suggestion(
+                        document_name, selected_page, current_bbox_num, selected_bbox_text, source=suggestion_source
+                    )
+                    if stored_suggestion and stored_suggestion['changed']:
+                        st.session_state[combined_correction_key] = stored_suggestion['suggested_text']
+                        break
+            
             if combined_correction_key in st.session_state and st.session_state[combined_correction_key]:
                 
                 # Combined Correction Suggestion Text box (LLM + Rules or either one)
@@ -622,7 +687,10 @@ if st.session_state.current_view == "anotacao":
                             bbox_number=st.session_state.bbox_num,
                             text_with_error=selected_bbox_text,
                             ground_truth=ground_truth,
-                            error_type=error_type
+                            error_type=error_type,
+                            source_document=document_name,
+                            annotator=st.session_state.get("username"),
+                            bbox=current_bbox
                         )
                         st.success("Erro submetido com sucesso!")
                         st.rerun()
@@ -632,8 +700,7 @@ if st.session_state.current_view == "anotacao":
     st.subheader("Erros Existentes")
 
     # Database stores document_name as year (e.g., "1939"), not full document name
-    errors = get_errors(document_name_db)
-    page_errors = [e for e in errors if e['page_number'] == selected_page]
+    page_errors = get_page_errors(document_name_db, selected_page)
 
     if page_errors:
         # Display errors with delete buttons
@@ -661,69 +728,35 @@ if st.session_state.current_view == "anotacao":
 elif st.session_state.current_view == "estatisticas":
     st.header("Estatísticas de Anotação")
     
-    # Get all errors
-    all_errors = get_errors()
+    # Read from the summary tables the database maintains on every write
+    metrics = get_annotation_metrics()
+    totals = metrics.totals
     
-    if not all_errors:
+    if not totals['errors']:
         st.info("Ainda não existem anotações registadas.")
     else:
         # Overall statistics
         col1, col2, col3, col4 = st.columns(4)
         
-        total_errors = len(all_errors)
-        minor_errors = len([e for e in all_errors if e['error_type'] == 'minor'])
-        major_errors = len([e for e in all_errors if e['error_type'] == 'major'])
-        unique_documents = len(set(e['document_name'] for e in all_errors))
-        
         with col1:
-            st.metric("Total de Erros", total_errors)
+            st.metric("Total de Erros", totals['errors'])
         with col2:
-            st.metric("Erros Menores", minor_errors)
+            st.metric("Erros Menores", totals['minor_errors'])
         with col3:
-            st.metric("Erros Maiores", major_errors)
+            st.metric("Erros Maiores", totals['major_errors'])
         with col4:
-            st.metric("Documentos", unique_documents)
+            st.metric("Documentos", totals['documents'])
         
-        # Calculate word error statistics
-        with st.spinner("A calcular estatísticas de erros de palavras..."):
-            # Get unique document names that have errors
-            documents_with_errors = set(error['document_name'] for error in all_errors)
-            
-            # Count total OCR words only from documents with errors
-            total_ocr_words = 0
-            for doc_name in documents_with_errors:
-                doc_dir = parsed_docs_dir / doc_name
-                if doc_dir.exists() and doc_dir.is_dir():
-                    mmd_file_list = list(doc_dir.glob("DR_*_det.mmd"))
-                    if mmd_file_list:
-                        try:
-                            parsed_doc_data = parse_mmd_file(str(mmd_file_list[0]))
-                            for page_num, bboxes in parsed_doc_data.items():
-                                for bbox, text in bboxes:
-                                    total_ocr_words += count_words(text)
-                        except Exception as e:
-                            st.warning(f"Não foi possível processar {doc_name}: {e}")
-            
-            # Count error words
-            minor_error_words = 0
-            major_error_words = 0
-            total_error_words = 0
-            
-            for error in all_errors:
-                error_word_count = count_differing_words(
-                    error['text_with_error'], 
-                    error['ground_truth']
-                )
-                total_error_words += error_word_count
-                if error['error_type'] == 'minor':
-                    minor_error_words += error_word_count
-                else:
-                    major_error_words += error_word_count
-            
-            # Calculate percentages
-            minor_error_pct = (minor_error_words / total_ocr_words * 100) if total_ocr_words > 0 else 0
-            major_error_pct = (major_error_words / total_ocr_words * 100) if total_ocr_words > 0 else 0
-            total_error_pct = (total_error_words / total_ocr_words * 100) if total_ocr_words > 0 else 0
+        # Word error statistics over the OCR words of the documents with errors
+        total_ocr_words = totals['ocr_words']
+        minor_error_words = totals['minor_words']
+        major_error_words = totals['differing_words'] - minor_error_words
+        total_error_words = totals['differing_words']
+        
+        # Calculate percentages
+        minor_error_pct = (minor_error_words / total_ocr_words * 100) if total_ocr_words > 0 else 0
+        major_error_pct = (major_error_words / total_ocr_words * 100) if total_ocr_words > 0 else 0
+        total_error_pct = totals['error_pct']
         
         # Word error statistics section
         st.subheader("Estatísticas de Erros de Palavras")
@@ -741,60 +774,57 @@ elif st.session_state.current_view == "estatisticas":
             accuracy = (1 - total_error_pct / 100) * 100 if total_ocr_words > 0 else 100
             st.metric("Precisão", f"{accuracy:.3f}%")
         
+        # Error rates of the annotated boxes against their ground truth
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("WER (caixas anotadas)", f"{totals['wer'] * 100:.2f}%")
+        with col2:
+            st.metric("CER (caixas anotadas)", f"{totals['cer'] * 100:.2f}%")
+        
         st.divider()
         
         # Errors by document
         st.subheader("Erros por Documento")
-        doc_stats = {}
-        for error in all_errors:
-            doc_name = error['document_name']
-            if doc_name not in doc_stats:
-                doc_stats[doc_name] = {'total': 0, 'minor': 0, 'major': 0}
-            doc_stats[doc_name]['total'] += 1
-            doc_stats[doc_name][error['error_type']] += 1
-        
-        # Display as table
-        doc_df = pd.DataFrame([
-            {
-                'Documento': doc,
-                'Total': stats['total'],
-                'Menores': stats['minor'],
-                'Maiores': stats['major']
-            }
-            for doc, stats in sorted(doc_stats.items())
-        ])
-        st.dataframe(doc_df, width='stretch', hide_index=True)
+        doc_df = metrics.by_document.rename(columns={
+            'document_name': 'Documento',
+            'errors': 'Total',
+            'minor_errors': 'Menores',
+            'major_errors': 'Maiores',
+            'differing_words': 'Palavras com Erro',
+            'ocr_words': 'Palavras OCR',
+        })
+        doc_df['WER (%)'] = doc_df['wer'] * 100
+        doc_df['CER (%)'] = doc_df['cer'] * 100
+        st.dataframe(
+            doc_df[['Documento', 'Total', 'Menores', 'Maiores', 'Palavras com Erro', 'Palavras OCR',
+                    'WER (%)', 'CER (%)']],
+            width='stretch', hide_index=True
+        )
         
         st.divider()
         
         # Errors per page for selected document
         st.subheader(f"Erros por Página - {selected_dir.name}")
-        doc_errors = [e for e in all_errors if e['document_name'] == selected_dir.name]
+        doc_page_stats = get_page_metrics(selected_dir.name)
         
-        if doc_errors:
-            page_stats = {}
-            for error in doc_errors:
-                page_num = error['page_number']
-                if page_num not in page_stats:
-                    page_stats[page_num] = {'total': 0, 'minor': 0, 'major': 0}
-                page_stats[page_num]['total'] += 1
-                page_stats[page_num][error['error_type']] += 1
-            
-            page_df = pd.DataFrame([
-                {
-                    'Página': page,
-                    'Total': stats['total'],
-                    'Menores': stats['minor'],
-                    'Maiores': stats['major']
-                }
-                for page, stats in sorted(page_stats.items())
-            ])
-            st.dataframe(page_df, width='stretch', hide_index=True)
+        if len(doc_page_stats) > 0:
+            page_df = doc_page_stats.rename(columns={
+                'page_number': 'Página',
+                'errors': 'Total',
+                'minor_errors': 'Menores',
+                'major_errors': 'Maiores',
+                'differing_words': 'Palavras com Erro',
+            })
+            page_df['WER (%)'] = page_df['wer'] * 100
+            page_df['CER (%)'] = page_df['cer'] * 100
+            st.dataframe(
+                page_df[['Página', 'Total', 'Menores', 'Maiores', 'Palavras com Erro', 'WER (%)', 'CER (%)']],
+                width='stretch', hide_index=True
+            )
             
             # Bar chart of errors per page
-            if len(page_df) > 0:
-                st.subheader("Erros por Página (Gráfico)")
-                st.bar_chart(page_df.set_index('Página')[['Menores', 'Maiores']], height=400)
+            st.subheader("Erros por Página (Gráfico)")
+            st.bar_chart(page_df.set_index('Página')[['Menores', 'Maiores']], height=400)
         else:
             st.info(f"Ainda não existem erros registados para o documento {selected_dir.name}.")
         
@@ -802,7 +832,7 @@ elif st.session_state.current_view == "estatisticas":
         
         # Recent errors
         st.subheader("Erros Recentes")
-        recent_errors = sorted(all_errors, key=lambda x: x['created_at'], reverse=True)[:10]
+        recent_errors = get_recent_errors(10)
         
         for error in recent_errors:
             error_type_pt = config.ERROR_TYPE_LABELS.get(error['error_type'], error['error_type']).lower()
@@ -8,7 +8,7 @@ from pathlib import Path
 
 load_dotenv()
 
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 DEFAULT_VISION_MODEL = os.getenv("OPENROUTER_VISION_MODEL")
 
@@ -18,7 +18,41 @@ AUTH_PASSWORD = os.getenv("AUTH_PASSWORD")
 # LLM API settings
 LLM_TEMPERATURE = 1
 
-# Text replacement rules dictionary
+# Background vision-LLM corrections (see llm_service.py)
+# Maximum number of requests in flight at once
+LLM_MAX_CONCURRENCY = 4
+# Maximum number of requests started per minute (0 disables the limit)
+LLM_REQUESTS_PER_MINUTE = 60
+# Retries of a failed request (rate limits, timeouts, connection and server errors)
+LLM_MAX_RETRIES = 4
+# Delay before the first retry, doubled on every further attempt
+LLM_RETRY_BACKOFF_SECONDS = 1.0
+# Number of bbox results kept by the service
+LLM_RESULTS_MAX_ENTRIES = 2048
+# Seconds between checks of a pending correction in the UI
+LLM_POLL_INTERVAL = 2
+# Seconds the UI waits for a correction it just queued before polling (cache hits answer within it)
+LLM_SUBMIT_WAIT_SECONDS = 0.5
+
+# Encoding of the crops sent to the vision model (see api_utils.encode_image_for_vision)
+# Crops above this many pixels are downsampled to it
+VISION_MAX_PIXELS = 1_000_000
+# Send grayscale crops. Off by default: PROMPT_IMAGE points the model at the light blue highlight
+VISION_GRAYSCALE = False
+# JPEG qualities tried in order until the payload fits VISION_TARGET_BYTES (the last one is kept)
+VISION_JPEG_QUALITIES = (75, 65, 55, 45)
+VISION_TARGET_BYTES = 48_000
+# Number of encoded crops memoized
+VISION_ENCODE_CACHE_ENTRIES = 256
+
+# Persistent cache of vision-LLM transcriptions (see llm_cache.py)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+LLM_CACHE_MAX_ENTRIES = 50000
+LLM_CACHE_MAX_AGE_DAYS = 180
+
+# Text replacement rules dictionary, applied as whole words by the "Regras" tool (see rule_engine.py).
+# Lowercase, Capitalized and UPPERCASE variants are generated automatically;
+# explicit entries take precedence.
 RULES_DICT = {
     "governo": "govêrno",
     "Governo": "Govêrno",
@@ -43,6 +77,16 @@ Output only the transcribed text without any additional comments or explanations
 # Directory containing parsed documents
 PARSED_DOCS_DIR = Path("parsed_docs")
 
+# Minimum number of seconds between checks of parsed_docs/ for new documents
+CATALOG_REFRESH_INTERVAL = 5
+
+# Binary index sidecar written next to each parsed .mmd file (see mmd_index.py)
+MMD_INDEX_SUFFIX = ".idx"
+# Number of parsed documents kept open (memory-mapped) by the document store
+DOCUMENT_STORE_MAX_DOCUMENTS = 64
+# Number of documents whose OCR word counts are kept for the statistics view
+METRICS_WORD_COUNT_CACHE_ENTRIES = 4096
+
 # Streamlit page configuration
 PAGE_TITLE = "Ferramenta de Anotação OCR"
 PAGE_LAYOUT = "wide"
@@ -77,6 +121,46 @@ ERROR_TYPE_LABELS = {
 TARGET_DPI = 144
 DEFAULT_DPI = 72  # PyMuPDF default
 
+# Rendered page cache settings
+# Number of rasterized pages kept in memory (shared by all sessions)
+PAGE_CACHE_MAX_ENTRIES = 16
+# Optional directory used to spill rendered pages to disk (disabled when unset)
+PAGE_CACHE_DIR = Path(os.getenv("PAGE_CACHE_DIR")) if os.getenv("PAGE_CACHE_DIR") else None
+# Byte budget of the disk tier; least recently used pages are evicted beyond it
+PAGE_CACHE_DIR_MAX_BYTES = int(os.getenv("PAGE_CACHE_DIR_MAX_BYTES", 2 * 1024 ** 3))
+
+# Number of highlighted bbox crops kept in memory (shared by all sessions)
+CROP_CACHE_MAX_ENTRIES = 256
+
+# Precomputed bbox crop tiles (see tile_store.py)
+# Tiles of DR_DD_MM_YYYY are stored in DR_DD_MM_YYYY_tiles next to its files
+TILES_DIR_SUFFIX = "_tiles"
+TILE_FORMAT = "WEBP"
+TILE_QUALITY = 85
+
+# Background prefetching of upcoming bbox crops and pages
+# Number of boxes after the current one whose crops are prepared in advance
+PREFETCH_AHEAD = 3
+# Number of worker threads used for prefetching
+PREFETCH_WORKERS = 2
+
+# Pooled PDF document handles
+# Seconds an unused fitz.Document stays open before being closed
+PDF_POOL_IDLE_TIMEOUT = 600
+# Maximum number of open documents kept in the pool
+PDF_POOL_MAX_DOCUMENTS = 8
+
+# Render bbox crops by rasterizing only their padded clip rectangle instead of the whole page
+CLIP_RENDERING = True
+# DPI of clip-rendered crops (None uses TARGET_DPI); raise it for small print
+CLIP_RENDER_DPI = None
+# Crop scanned pages (a single embedded image) straight from the decoded scan instead of rasterizing them.
+# Off by default: decoding the scan makes the first crop of a page ~5x slower than a clip render,
+# which only pays off when most boxes of a page are cropped (e.g. tiling large issues)
+SCAN_EXTRACTION = False
+# Number of decoded page scans kept in memory (an RGB scan at 300 DPI takes ~27 MB)
+SCAN_CACHE_MAX_ENTRIES = 4
+
 # Image offset settings
 OFFSET_X = 0
 OFFSET_Y = 0
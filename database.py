@@ -1,18 +1,240 @@
+import atexit
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict
+from text_utils import count_differing_words, score_errors, score_texts
 
 
 DB_PATH = 'annotations.db'
 
+# Maximum number of idle connections kept per database
+POOL_SIZE = 8
+# Milliseconds SQLite waits on a locked database before raising "database is locked"
+BUSY_TIMEOUT_MS = 5000
+# Extra attempts (with exponential backoff) when the database is still locked
+LOCKED_RETRIES = 5
+LOCKED_BACKOFF_SECONDS = 0.05
+# Page cache per connection, in KiB (negative values are KiB for PRAGMA cache_size)
+CACHE_SIZE_KIB = 16384
+# Number of compiled statements cached per connection
+CACHED_STATEMENTS = 128
 
-def init_db():
-    """Initialize the SQLite database with errors table."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    c.execute('''
+# SQL statements are module constants so every connection reuses its compiled statements
+INSERT_ERROR_SQL = '''
+    INSERT INTO errors (document_name, page_number, bbox_number,
+                      text_with_error, ground_truth, error_type,
+                      source_document, annotator, bbox_x1, bbox_y1, bbox_x2, bbox_y2,
+                      differing_words, reference_words, differing_chars, reference_chars)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+SELECT_DOCUMENT_ERRORS_SQL = '''
+    SELECT * FROM errors
+    WHERE document_name = ?
+    ORDER BY page_number, bbox_number
+'''
+SELECT_ALL_ERRORS_SQL = '''
+    SELECT * FROM errors
+    ORDER BY document_name, page_number, bbox_number
+'''
+SELECT_PAGE_ERRORS_SQL = '''
+    SELECT * FROM errors
+    WHERE document_name = ? AND page_number = ?
+    ORDER BY bbox_number
+'''
+SELECT_BBOX_ERRORS_SQL = '''
+    SELECT * FROM errors
+    WHERE document_name = ? AND page_number = ? AND bbox_number = ?
+    ORDER BY created_at DESC, id DESC
+'''
+SELECT_RECENT_ERRORS_SQL = '''
+    SELECT * FROM errors
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+'''
+SELECT_ERROR_SCORES_SQL = '''
+    SELECT id, document_name, page_number, bbox_number, error_type,
+           differing_words, reference_words, differing_chars, reference_chars
+    FROM errors
+    {where}
+    ORDER BY document_name, page_number, bbox_number, id
+'''
+DELETE_ERROR_SQL = 'DELETE FROM errors WHERE id = ?'
+SELECT_ERROR_TYPE_STATS_SQL = '''
+    SELECT error_type, SUM(error_count) AS error_count, SUM(differing_words) AS differing_words,
+           SUM(reference_words) AS reference_words, SUM(differing_chars) AS differing_chars,
+           SUM(reference_chars) AS reference_chars
+    FROM error_stats_document
+    GROUP BY error_type
+'''
+SELECT_DOCUMENT_STATS_SQL = '''
+    SELECT document_name, error_type, error_count, differing_words,
+           reference_words, differing_chars, reference_chars
+    FROM error_stats_document
+    ORDER BY document_name, error_type
+'''
+SELECT_PAGE_STATS_SQL = '''
+    SELECT page_number, error_type, error_count, differing_words,
+           reference_words, differing_chars, reference_chars
+    FROM error_stats_page
+    WHERE document_name = ?
+    ORDER BY page_number, error_type
+'''
+UPSERT_SUGGESTION_SQL = '''
+    INSERT INTO suggestions (source_document, page_number, bbox_number, source,
+                             text_hash, suggested_text, changed)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (source_document, page_number, bbox_number, source) DO UPDATE SET
+        text_hash = excluded.text_hash,
+        suggested_text = excluded.suggested_text,
+        changed = excluded.changed,
+        created_at = CURRENT_TIMESTAMP
+'''
+SELECT_PAGE_SUGGESTIONS_SQL = '''
+    SELECT * FROM suggestions
+    WHERE source_document = ? AND page_number = ? AND source = ?
+    ORDER BY bbox_number
+'''
+SELECT_CHANGED_SUGGESTIONS_SQL = '''
+    SELECT page_number, bbox_number, text_hash FROM suggestions
+    WHERE source_document = ? AND source = ? AND changed = 1
+    ORDER BY page_number, bbox_number
+'''
+CREATE_SCHEMA_VERSION_SQL = '''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+SELECT_GROUND_TRUTH_SQL = '''
+    SELECT ground_truth FROM errors
+    WHERE document_name = ? AND page_number = ? AND bbox_number = ?
+    ORDER BY created_at DESC, id DESC
+    LIMIT 1
+'''
+
+
+class _ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections to one database file.
+
+    Connections use WAL journaling, so readers are not blocked by a writer,
+    and are reused across calls and threads instead of being reopened.
+    """
+
+    def __init__(self, db_path: str, max_size: int):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue(maxsize=max_size)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        # NORMAL is durable in WAL mode except for the last commits on power loss
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KIB}')
+        conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, returning it to the pool afterwards."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close_all(self):
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# {database path: _ConnectionPool}
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool() -> _ConnectionPool:
+    """Get the connection pool of the current DB_PATH."""
+    pool = _pools.get(DB_PATH)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(DB_PATH)
+            if pool is None:
+                pool = _ConnectionPool(DB_PATH, POOL_SIZE)
+                _pools[DB_PATH] = pool
+    return pool
+
+
+def _is_locked_error(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def _run(operation):
+    """
+    Run operation(conn) on a pooled connection.
+
+    When the database stays locked beyond the busy timeout, the operation is
+    retried with exponential backoff before giving up.
+    """
+    for attempt in range(LOCKED_RETRIES + 1):
+        try:
+            with _get_pool().connection() as conn:
+                return operation(conn)
+        except sqlite3.OperationalError as e:
+            if not _is_locked_error(e) or attempt == LOCKED_RETRIES:
+                raise
+            time.sleep(LOCKED_BACKOFF_SECONDS * (2 ** attempt))
+
+
+def close_connections():
+    """Close the pooled connections of every database."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+
+
+# Closing the last connection checkpoints the WAL back into the database file
+atexit.register(close_connections)
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row['name'] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, definition: str):
+    """Add a column unless it already exists (keeps migrations idempotent)."""
+    if column not in _table_columns(conn, table):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def _migration_errors_table(conn: sqlite3.Connection):
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS errors (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             document_name TEXT NOT NULL,
@@ -24,78 +246,489 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    
-    conn.commit()
-    conn.close()
+
+
+def _migration_error_indexes(conn: sqlite3.Connection):
+    # Per-page / per-bbox lookups; created_at last so the latest ground truth is read in index order
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_errors_document_page_bbox
+        ON errors (document_name, page_number, bbox_number, created_at)
+    ''')
+    # Most recent errors
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_errors_created_at
+        ON errors (created_at)
+    ''')
+
+
+def _migration_annotation_details(conn: sqlite3.Connection):
+    # document_name holds the year; source_document keeps the full DR_DD_MM_YYYY name
+    _add_column(conn, 'errors', 'source_document', 'TEXT')
+    _add_column(conn, 'errors', 'annotator', 'TEXT')
+    for column in ('bbox_x1', 'bbox_y1', 'bbox_x2', 'bbox_y2'):
+        _add_column(conn, 'errors', column, 'INTEGER')
+
+
+def _migration_error_statistics(conn: sqlite3.Connection):
+    # Word-level difference of each error, computed by insert_error
+    _add_column(conn, 'errors', 'differing_words', 'INTEGER NOT NULL DEFAULT 0')
+    rows = conn.execute('SELECT id, text_with_error, ground_truth FROM errors').fetchall()
+    conn.executemany(
+        'UPDATE errors SET differing_words = ? WHERE id = ?',
+        [(count_differing_words(row['text_with_error'], row['ground_truth']), row['id']) for row in rows]
+    )
+
+    # Summary tables, kept in sync with errors by the triggers below
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS error_stats_document (
+            document_name TEXT NOT NULL,
+            error_type TEXT NOT NULL,
+            error_count INTEGER NOT NULL,
+            differing_words INTEGER NOT NULL,
+            PRIMARY KEY (document_name, error_type)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS error_stats_page (
+            document_name TEXT NOT NULL,
+            page_number INTEGER NOT NULL,
+            error_type TEXT NOT NULL,
+            error_count INTEGER NOT NULL,
+            differing_words INTEGER NOT NULL,
+            PRIMARY KEY (document_name, page_number, error_type)
+        )
+    ''')
+    _rebuild_error_statistics(conn)
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_errors_stats_insert AFTER INSERT ON errors
+        BEGIN
+            INSERT INTO error_stats_document (document_name, error_type, error_count, differing_words)
+            VALUES (NEW.document_name, NEW.error_type, 1, NEW.differing_words)
+            ON CONFLICT (document_name, error_type) DO UPDATE SET
+                error_count = error_count + 1,
+                differing_words = differing_words + excluded.differing_words;
+            INSERT INTO error_stats_page (document_name, page_number, error_type, error_count, differing_words)
+            VALUES (NEW.document_name, NEW.page_number, NEW.error_type, 1, NEW.differing_words)
+            ON CONFLICT (document_name, page_number, error_type) DO UPDATE SET
+                error_count = error_count + 1,
+                differing_words = differing_words + excluded.differing_words;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_errors_stats_delete AFTER DELETE ON errors
+        BEGIN
+            UPDATE error_stats_document
+            SET error_count = error_count - 1, differing_words = differing_words - OLD.differing_words
+            WHERE document_name = OLD.document_name AND error_type = OLD.error_type;
+            DELETE FROM error_stats_document
+            WHERE document_name = OLD.document_name AND error_type = OLD.error_type AND error_count <= 0;
+            UPDATE error_stats_page
+            SET error_count = error_count - 1, differing_words = differing_words - OLD.differing_words
+            WHERE document_name = OLD.document_name AND page_number = OLD.page_number
+                AND error_type = OLD.error_type;
+            DELETE FROM error_stats_page
+            WHERE document_name = OLD.document_name AND page_number = OLD.page_number
+                AND error_type = OLD.error_type AND error_count <= 0;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_errors_stats_update
+        AFTER UPDATE OF document_name, page_number, error_type, differing_words ON errors
+        BEGIN
+            UPDATE error_stats_document
+            SET error_count = error_count - 1, differing_words = differing_words - OLD.differing_words
+            WHERE document_name = OLD.document_name AND error_type = OLD.error_type;
+            DELETE FROM error_stats_document
+            WHERE document_name = OLD.document_name AND error_type = OLD.error_type AND error_count <= 0;
+            UPDATE error_stats_page
+            SET error_count = error_count - 1, differing_words = differing_words - OLD.differing_words
+            WHERE document_name = OLD.document_name AND page_number = OLD.page_number
+                AND error_type = OLD.error_type;
+            DELETE FROM error_stats_page
+            WHERE document_name = OLD.document_name AND page_number = OLD.page_number
+                AND error_type = OLD.error_type AND error_count <= 0;
+            INSERT INTO error_stats_document (document_name, error_type, error_count, differing_words)
+            VALUES (NEW.document_name, NEW.error_type, 1, NEW.differing_words)
+            ON CONFLICT (document_name, error_type) DO UPDATE SET
+                error_count = error_count + 1,
+                differing_words = differing_words + excluded.differing_words;
+            INSERT INTO error_stats_page (document_name, page_number, error_type, error_count, differing_words)
+            VALUES (NEW.document_name, NEW.page_number, NEW.error_type, 1, NEW.differing_words)
+            ON CONFLICT (document_name, page_number, error_type) DO UPDATE SET
+                error_count = error_count + 1,
+                differing_words = differing_words + excluded.differing_words;
+        END
+    ''')
+
+
+def _rebuild_error_statistics(conn: sqlite3.Connection):
+    """Recompute the summary tables from the errors table."""
+    conn.execute('DELETE FROM error_stats_document')
+    conn.execute('''
+        INSERT INTO error_stats_document (document_name, error_type, error_count, differing_words)
+        SELECT document_name, error_type, COUNT(*), SUM(differing_words)
+        FROM errors GROUP BY document_name, error_type
+    ''')
+    conn.execute('DELETE FROM error_stats_page')
+    conn.execute('''
+        INSERT INTO error_stats_page (document_name, page_number, error_type, error_count, differing_words)
+        SELECT document_name, page_number, error_type, COUNT(*), SUM(differing_words)
+        FROM errors GROUP BY document_name, page_number, error_type
+    ''')
+
+
+def _migration_aligned_differing_words(conn: sqlite3.Connection):
+    # count_differing_words now uses a word alignment instead of a positional comparison;
+    # the update trigger moves the summary tables along with the recounted values
+    rows = conn.execute('SELECT id, text_with_error, ground_truth, differing_words FROM errors').fetchall()
+    updates = []
+    for row in rows:
+        differing_words = count_differing_words(row['text_with_error'], row['ground_truth'])
+        if differing_words != row['differing_words']:
+            updates.append((differing_words, row['id']))
+    conn.executemany('UPDATE errors SET differing_words = ? WHERE id = ?', updates)
+
+
+def _migration_suggestions(conn: sqlite3.Connection):
+    # Precomputed corrections per bbox; source is the tool that produced them ('rules', 'llm').
+    # text_hash is the hash of the OCR text the suggestion was computed from, so suggestions
+    # made for an older version of a document are ignored.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS suggestions (
+            source_document TEXT NOT NULL,
+            page_number INTEGER NOT NULL,
+            bbox_number INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            text_hash TEXT NOT NULL,
+            suggested_text TEXT NOT NULL,
+            changed INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source_document, page_number, bbox_number, source)
+        )
+    ''')
+    # Boxes where a tool changed the text, in reading order
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_suggestions_changed
+        ON suggestions (source_document, source, changed, page_number, bbox_number)
+    ''')
+
+
+# Counts summed by the statistics tables besides error_count (WER = differing / reference words,
+# CER = differing / reference characters)
+_STATISTICS_COLUMNS = ('differing_words', 'reference_words', 'differing_chars', 'reference_chars')
+# Statistics tables and their grouping columns (besides error_type)
+_STATISTICS_TABLES = (
+    ('error_stats_document', ('document_name',)),
+    ('error_stats_page', ('document_name', 'page_number')),
+)
+
+
+def _statistics_add_sql(table, keys):
+    """Trigger statement adding the NEW row to a statistics table."""
+    columns = keys + ('error_type',)
+    return f'''
+            INSERT INTO {table} ({', '.join(columns)}, error_count, {', '.join(_STATISTICS_COLUMNS)})
+            VALUES ({', '.join(f'NEW.{c}' for c in columns)}, 1, {', '.join(f'NEW.{c}' for c in _STATISTICS_COLUMNS)})
+            ON CONFLICT ({', '.join(columns)}) DO UPDATE SET
+                error_count = error_count + 1,
+                {', '.join(f'{c} = {c} + excluded.{c}' for c in _STATISTICS_COLUMNS)};'''
+
+
+def _statistics_remove_sql(table, keys):
+    """Trigger statements removing the OLD row from a statistics table."""
+    where = ' AND '.join(f'{c} = OLD.{c}' for c in keys + ('error_type',))
+    return f'''
+            UPDATE {table}
+            SET error_count = error_count - 1, {', '.join(f'{c} = {c} - OLD.{c}' for c in _STATISTICS_COLUMNS)}
+            WHERE {where};
+            DELETE FROM {table} WHERE {where} AND error_count <= 0;'''
+
+
+def _migration_error_rate_statistics(conn: sqlite3.Connection):
+    # Reference word and character counts of each error, computed once by insert_error, so
+    # WER/CER aggregate from the statistics tables instead of rescoring every annotation
+    for column in ('reference_words', 'differing_chars', 'reference_chars'):
+        _add_column(conn, 'errors', column, 'INTEGER NOT NULL DEFAULT 0')
+    rows = conn.execute('SELECT id, text_with_error, ground_truth FROM errors').fetchall()
+    conn.executemany(
+        'UPDATE errors SET reference_words = ?, differing_chars = ?, reference_chars = ? WHERE id = ?',
+        [(score['reference_words'], score['differing_chars'], score['reference_chars'], row['id'])
+         for row, score in zip(rows, score_errors(rows))]
+    )
+
+    # Recreate the statistics tables and their triggers with the new counts
+    for trigger in ('trg_errors_stats_insert', 'trg_errors_stats_delete', 'trg_errors_stats_update'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    counts = ', '.join(f'{c} INTEGER NOT NULL' for c in _STATISTICS_COLUMNS)
+    for table, keys in _STATISTICS_TABLES:
+        key_columns = ', '.join(keys + ('error_type',))
+        key_definitions = ', '.join(
+            f"{c} {'INTEGER' if c == 'page_number' else 'TEXT'} NOT NULL" for c in keys + ('error_type',)
+        )
+        conn.execute(f'DROP TABLE IF EXISTS {table}')
+        conn.execute(f'''
+            CREATE TABLE {table} (
+                {key_definitions},
+                error_count INTEGER NOT NULL,
+                {counts},
+                PRIMARY KEY ({key_columns})
+            )
+        ''')
+        conn.execute(f'''
+            INSERT INTO {table} ({key_columns}, error_count, {', '.join(_STATISTICS_COLUMNS)})
+            SELECT {key_columns}, COUNT(*), {', '.join(f'SUM({c})' for c in _STATISTICS_COLUMNS)}
+            FROM errors GROUP BY {key_columns}
+        ''')
+
+    conn.execute(f'''
+        CREATE TRIGGER trg_errors_stats_insert AFTER INSERT ON errors
+        BEGIN{''.join(_statistics_add_sql(table, keys) for table, keys in _STATISTICS_TABLES)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER trg_errors_stats_delete AFTER DELETE ON errors
+        BEGIN{''.join(_statistics_remove_sql(table, keys) for table, keys in _STATISTICS_TABLES)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER trg_errors_stats_update
+        AFTER UPDATE OF document_name, page_number, error_type, {', '.join(_STATISTICS_COLUMNS)} ON errors
+        BEGIN{''.join(_statistics_remove_sql(table, keys) for table, keys in _STATISTICS_TABLES)}{''.join(_statistics_add_sql(table, keys) for table, keys in _STATISTICS_TABLES)}
+        END
+    ''')
+
+
+def _score_annotation(text_with_error, ground_truth):
+    """
+    Score an error annotation into the counts stored with it (_STATISTICS_COLUMNS).
+
+    Annotations with an empty text or ground truth are not scored (all counts 0,
+    as count_differing_words has always done), so WER and CER agree on them.
+    """
+    if not text_with_error or not ground_truth:
+        return dict.fromkeys(_STATISTICS_COLUMNS, 0)
+    score = score_texts(text_with_error, ground_truth)
+    return {column: score[column] for column in _STATISTICS_COLUMNS}
+
+
+def _migration_unscored_empty_annotations(conn: sqlite3.Connection):
+    # Migration 7 counted reference words and characters of annotations with an empty side,
+    # whose differing words were always 0; the update trigger moves the summary tables along
+    conn.execute(f'''
+        UPDATE errors SET {', '.join(f'{c} = 0' for c in _STATISTICS_COLUMNS)}
+        WHERE (COALESCE(text_with_error, '') = '' OR COALESCE(ground_truth, '') = '')
+          AND ({' OR '.join(f'{c} != 0' for c in _STATISTICS_COLUMNS)})
+    ''')
+
+
+# Ordered schema migrations: (version, description, function)
+# Never edit or reorder applied migrations; append new ones with the next version.
+MIGRATIONS = [
+    (1, 'errors table', _migration_errors_table),
+    (2, 'errors lookup indexes', _migration_error_indexes),
+    (3, 'errors annotation details', _migration_annotation_details),
+    (4, 'materialized error statistics', _migration_error_statistics),
+    (5, 'recount differing words with word alignment', _migration_aligned_differing_words),
+    (6, 'suggestions table', _migration_suggestions),
+    (7, 'error rate statistics', _migration_error_rate_statistics),
+    (8, 'zero counts of annotations with an empty side', _migration_unscored_empty_annotations),
+]
+
+# Databases already migrated by this process
+_initialized_paths = set()
+_init_lock = threading.Lock()
+
+
+def migrate():
+    """
+    Apply the pending migrations to the database, in order.
+
+    Each migration runs in its own IMMEDIATE transaction together with its
+    schema_version row, so concurrent processes never apply it twice and a
+    failing migration leaves the database at the previous version.
+    """
+    def _migrate(conn):
+        conn.execute(CREATE_SCHEMA_VERSION_SQL)
+        for version, description, migration in MIGRATIONS:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                applied = conn.execute(
+                    'SELECT 1 FROM schema_version WHERE version = ?', (version,)
+                ).fetchone()
+                if not applied:
+                    migration(conn)
+                    conn.execute(
+                        'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                        (version, description)
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    _run(_migrate)
+
+
+def init_db():
+    """
+    Initialize the SQLite database, applying pending schema migrations.
+
+    Migrations run once per database per process; later calls (e.g. on every
+    Streamlit rerun) return immediately.
+    """
+    if DB_PATH in _initialized_paths:
+        return
+    with _init_lock:
+        if DB_PATH not in _initialized_paths:
+            migrate()
+            _initialized_paths.add(DB_PATH)
 
 
 def insert_error(document_name: str, page_number: int, bbox_number: int, 
-                 text_with_error: str, ground_truth: str, error_type: str):
+                 text_with_error: str, ground_truth: str, error_type: str,
+                 source_document: str = None, annotator: str = None, bbox: List[int] = None):
     """Insert an error annotation into the database."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    c.execute('''
-        INSERT INTO errors (document_name, page_number, bbox_number, 
-                          text_with_error, ground_truth, error_type)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (document_name, page_number, bbox_number, text_with_error, 
-          ground_truth, error_type))
-    
-    conn.commit()
-    conn.close()
+    x1, y1, x2, y2 = bbox if bbox else (None, None, None, None)
+    # Scored once here; the statistics tables aggregate these counts
+    score = _score_annotation(text_with_error, ground_truth)
+
+    def _insert(conn):
+        with conn:
+            conn.execute(INSERT_ERROR_SQL, (document_name, page_number, bbox_number,
+                                            text_with_error, ground_truth, error_type,
+                                            source_document, annotator, x1, y1, x2, y2,
+                                            score['differing_words'], score['reference_words'],
+                                            score['differing_chars'], score['reference_chars']))
+
+    _run(_insert)
 
 
 def get_errors(document_name: str = None) -> List[Dict]:
     """Get all errors, optionally filtered by document name."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    
-    if document_name:
-        c.execute('''
-            SELECT * FROM errors 
-            WHERE document_name = ?
-            ORDER BY page_number, bbox_number
-        ''', (document_name,))
-    else:
-        c.execute('''
-            SELECT * FROM errors 
-            ORDER BY document_name, page_number, bbox_number
-        ''')
-    
-    rows = c.fetchall()
-    conn.close()
-    
+    def _select(conn):
+        if document_name:
+            return conn.execute(SELECT_DOCUMENT_ERRORS_SQL, (document_name,)).fetchall()
+        return conn.execute(SELECT_ALL_ERRORS_SQL).fetchall()
+
+    rows = _run(_select)
+
+    return [dict(row) for row in rows]
+
+
+def get_error_scores(document_name: str = None) -> List[Dict]:
+    """
+    Get the word and character counts stored with every error, optionally of one document.
+
+    The counts are scored once when an error is inserted, so no annotation text is read.
+    """
+    def _select(conn):
+        if document_name:
+            return conn.execute(SELECT_ERROR_SCORES_SQL.format(where='WHERE document_name = ?'),
+                                (document_name,)).fetchall()
+        return conn.execute(SELECT_ERROR_SCORES_SQL.format(where='')).fetchall()
+
+    rows = _run(_select)
+
+    return [dict(row) for row in rows]
+
+
+def get_page_errors(document_name: str, page_number: int) -> List[Dict]:
+    """Get the errors of one page of a document, ordered by bbox number."""
+    rows = _run(lambda conn: conn.execute(
+        SELECT_PAGE_ERRORS_SQL, (document_name, page_number)
+    ).fetchall())
+
+    return [dict(row) for row in rows]
+
+
+def get_bbox_errors(document_name: str, page_number: int, bbox_number: int) -> List[Dict]:
+    """Get the errors of one bbox, most recent first."""
+    rows = _run(lambda conn: conn.execute(
+        SELECT_BBOX_ERRORS_SQL, (document_name, page_number, bbox_number)
+    ).fetchall())
+
+    return [dict(row) for row in rows]
+
+
+def get_recent_errors(limit: int = 10) -> List[Dict]:
+    """Get the most recently submitted errors."""
+    rows = _run(lambda conn: conn.execute(SELECT_RECENT_ERRORS_SQL, (limit,)).fetchall())
+
     return [dict(row) for row in rows]
 
 
 def delete_error(error_id: int):
     """Delete an error annotation by ID."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    c.execute('DELETE FROM errors WHERE id = ?', (error_id,))
-    
-    conn.commit()
-    conn.close()
+    def _delete(conn):
+        with conn:
+            conn.execute(DELETE_ERROR_SQL, (error_id,))
+
+    _run(_delete)
 
 
 def get_ground_truth(document_name: str, page_number: int, bbox_number: int) -> str:
     """Get ground truth for a specific bbox, if it exists."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    
-    c.execute('''
-        SELECT ground_truth FROM errors 
-        WHERE document_name = ? AND page_number = ? AND bbox_number = ?
-        ORDER BY created_at DESC
-        LIMIT 1
-    ''', (document_name, page_number, bbox_number))
-    
-    row = c.fetchone()
-    conn.close()
-    
+    row = _run(lambda conn: conn.execute(
+        SELECT_GROUND_TRUTH_SQL, (document_name, page_number, bbox_number)
+    ).fetchone())
+
     return row['ground_truth'] if row else ""
 
+
+def get_error_type_stats() -> List[Dict]:
+    """Get error counts and word/character totals per error type (from the summary tables)."""
+    rows = _run(lambda conn: conn.execute(SELECT_ERROR_TYPE_STATS_SQL).fetchall())
+
+    return [dict(row) for row in rows]
+
+
+def get_document_stats() -> List[Dict]:
+    """Get error counts and word/character totals per document and error type."""
+    rows = _run(lambda conn: conn.execute(SELECT_DOCUMENT_STATS_SQL).fetchall())
+
+    return [dict(row) for row in rows]
+
+
+def get_page_stats(document_name: str) -> List[Dict]:
+    """Get error counts and word/character totals per page and error type of a document."""
+    rows = _run(lambda conn: conn.execute(SELECT_PAGE_STATS_SQL, (document_name,)).fetchall())
+
+    return [dict(row) for row in rows]
+
+
+def save_suggestions(suggestions: List[Dict]):
+    """
+    Insert or replace suggestions in a single transaction.
+
+    Args:
+        suggestions: Dicts with source_document, page_number, bbox_number, source,
+            text_hash, suggested_text and changed
+    """
+    def _save(conn):
+        with conn:
+            conn.executemany(UPSERT_SUGGESTION_SQL, [
+                (s['source_document'], s['page_number'], s['bbox_number'], s['source'],
+                 s['text_hash'], s['suggested_text'], int(s['changed']))
+                for s in suggestions
+            ])
+
+    _run(_save)
+
+
+def get_page_suggestions(source_document: str, page_number: int, source: str) -> Dict[int, Dict]:
+    """Get the suggestions of one tool for a page, as {bbox_number: suggestion}."""
+    rows = _run(lambda conn: conn.execute(
+        SELECT_PAGE_SUGGESTIONS_SQL, (source_document, page_number, source)
+    ).fetchall())
+
+    return {row['bbox_number']: dict(row) for row in rows}
+
+
+def get_changed_suggestions(source_document: str, source: str) -> List[Dict]:
+    """Get the (page_number, bbox_number, text_hash) of the boxes a tool changed, in reading order."""
+    rows = _run(lambda conn: conn.execute(
+        SELECT_CHANGED_SUGGESTIONS_SQL, (source_document, source)
+    ).fetchall())
+
+    return [dict(row) for row in rows]
@@ -0,0 +1,113 @@
+"""
+Process-wide, read-only store of parsed documents.
+
+Every Streamlit session annotating the same issue shares one ParsedDocument,
+backed by the memory-mapped binary index of its _det.mmd file (see
+mmd_index.py). Documents are replaced when the source file's mtime changes;
+sessions only hold references to the immutable page tuples. At most
+config.DOCUMENT_STORE_MAX_DOCUMENTS documents are kept, and replaced or
+evicted documents release their memory map.
+"""
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import config
+from mmd_index import load_mmd_index
+
+
+class ParsedDocument:
+    """
+    Immutable view of a parsed _det.mmd file.
+
+    Pages are decoded from the index on first access and shared afterwards as
+    tuples of ((x1, y1, x2, y2), text) entries.
+    """
+
+    def __init__(self, mmd_path, mtime_ns, index):
+        self.mmd_path = mmd_path
+        self.mtime_ns = mtime_ns
+        self.page_numbers = tuple(sorted(index))
+        self._index = index
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def _read_index(self, read):
+        """
+        Return read(index) under the lock.
+
+        A document that was closed (replaced or evicted) while a run still holds
+        it opens its index only for the call, so no memory map outlives close().
+        """
+        with self._lock:
+            if self._index is not None:
+                return read(self._index)
+            with load_mmd_index(self.mmd_path) as index:
+                return read(index)
+
+    def page(self, page_num):
+        """Return the bboxes of a page as a tuple of (bbox, text) tuples."""
+        def _decode(index):
+            entries = self._pages.get(page_num)
+            if entries is None:
+                entries = tuple((tuple(bbox), text) for bbox, text in index.get_page(page_num))
+                self._pages[page_num] = entries
+            return entries
+
+        entries = self._pages.get(page_num)
+        if entries is None:
+            entries = self._read_index(_decode)
+        return entries
+
+    def close(self):
+        """Release the memory map of the index; decoded pages stay available."""
+        with self._lock:
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+
+    def word_count(self, page_num=None):
+        """Return the OCR word count of a page, or of the whole document (stored in the index)."""
+        return self._read_index(lambda index: index.word_count(page_num))
+
+    def items(self):
+        """Iterate over (page_num, bboxes) pairs, like the parse_mmd_file dict."""
+        for page_num in self.page_numbers:
+            yield page_num, self.page(page_num)
+
+    def __contains__(self, page_num):
+        return page_num in self.page_numbers
+
+    def __len__(self):
+        return len(self.page_numbers)
+
+
+# {resolved .mmd path: ParsedDocument}, least recently used first
+_documents = OrderedDict()
+_documents_lock = threading.Lock()
+
+
+def get_document(mmd_path):
+    """
+    Get the shared ParsedDocument of an .mmd file.
+
+    The document is loaded once per process and reloaded only when the file's
+    mtime changes.
+    """
+    resolved = Path(mmd_path).resolve()
+    key = str(resolved)
+    mtime_ns = resolved.stat().st_mtime_ns
+
+    stale = []
+    with _documents_lock:
+        document = _documents.get(key)
+        if document is None or document.mtime_ns != mtime_ns:
+            if document is not None:
+                stale.append(document)
+            document = ParsedDocument(key, mtime_ns, load_mmd_index(resolved))
+            _documents[key] = document
+        _documents.move_to_end(key)
+        while len(_documents) > config.DOCUMENT_STORE_MAX_DOCUMENTS:
+            stale.append(_documents.popitem(last=False)[1])
+    for old_document in stale:
+        old_document.close()
+    return document
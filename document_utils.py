@@ -4,6 +4,8 @@ Document parsing and processing utility functions.
 from pathlib import Path
 import json
 import re
+import threading
+import time
 import config
 
 
@@ -80,25 +82,141 @@ def extract_date_from_json(json_path):
         return None, None, None
 
 
+def _scan_year_dir(year_dir):
+    """Return the document data of every DR_*.pdf file in a year folder."""
+    documents = []
+    # Find PDF files in this year folder
+    pdf_files = sorted(f for f in year_dir.glob("DR_*.pdf") if "_layouts" not in f.name)
+    for pdf_file in pdf_files:
+        day, month, year = parse_doc_name(pdf_file.name)
+        if day is not None:
+            documents.append({
+                'path': year_dir,  # The year folder path
+                'name': pdf_file.stem,  # Document name without extension (DR_DD_MM_YYYY)
+                'day': day,
+                'month': month,
+                'year': year
+            })
+    return documents
+
+
+class CorpusCatalog:
+    """
+    Cached catalog of the documents in the parsed documents folder.
+
+    Keeps a year -> month -> day index of the documents. Refreshing is
+    incremental: only the root folder and the year folders are stat'ed, and
+    a year folder is rescanned only when its mtime changed (a file was added,
+    removed or renamed in it). Checks are throttled to one every
+    refresh_interval seconds.
+    """
+
+    def __init__(self, root_dir, refresh_interval):
+        self.root_dir = Path(root_dir)
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._last_check = None
+        self._root_mtime = None
+        # {year folder: (mtime, [document data])}
+        self._year_dirs = {}
+        self._documents = []
+        # {year: {month: {day: [document data]}}}
+        self._index = {}
+
+    def refresh(self, force=False):
+        """Rescan the folders that changed since the last refresh."""
+        now = time.monotonic()
+        if not force and self._last_check is not None and now - self._last_check < self.refresh_interval:
+            return
+        with self._lock:
+            self._last_check = now
+            changed = False
+
+            root_mtime = self.root_dir.stat().st_mtime_ns if self.root_dir.is_dir() else None
+            if root_mtime != self._root_mtime:
+                # Year folders were added or removed
+                self._root_mtime = root_mtime
+                current_dirs = set(d for d in self.root_dir.iterdir() if d.is_dir()) if root_mtime else set()
+                for year_dir in set(self._year_dirs) - current_dirs:
+                    del self._year_dirs[year_dir]
+                    changed = True
+                for year_dir in current_dirs - set(self._year_dirs):
+                    self._year_dirs[year_dir] = (None, [])
+
+            for year_dir, (mtime, documents) in list(self._year_dirs.items()):
+                try:
+                    current_mtime = year_dir.stat().st_mtime_ns
+                except OSError:
+                    continue
+                if current_mtime != mtime:
+                    self._year_dirs[year_dir] = (current_mtime, _scan_year_dir(year_dir))
+                    changed = True
+
+            if changed:
+                self._rebuild_index()
+
+    def _rebuild_index(self):
+        documents = []
+        index = {}
+        for year_dir in sorted(self._year_dirs):
+            for doc in self._year_dirs[year_dir][1]:
+                documents.append(doc)
+                index.setdefault(doc['year'], {}).setdefault(doc['month'], {}).setdefault(doc['day'], []).append(doc)
+        self._documents = documents
+        self._index = index
+
+    def year_dirs(self):
+        """Return the sorted year folders."""
+        self.refresh()
+        return sorted(self._year_dirs)
+
+    def documents(self):
+        """Return the document data of every document."""
+        self.refresh()
+        return list(self._documents)
+
+    def years(self):
+        """Return the sorted years that have documents."""
+        self.refresh()
+        return sorted(self._index)
+
+    def months(self, year=None):
+        """Return the sorted months with documents in a year (or in any year)."""
+        self.refresh()
+        if year is None:
+            return sorted(set(month for months in self._index.values() for month in months))
+        return sorted(self._index.get(year, {}))
+
+    def days(self, year=None, month=None):
+        """Return the sorted days with documents in a year/month (or in any)."""
+        self.refresh()
+        if year is None or month is None:
+            return sorted(set(day for months in self._index.values()
+                              for m, days in months.items() if month is None or m == month
+                              for day in days))
+        return sorted(self._index.get(year, {}).get(month, {}))
+
+    def get(self, year, month, day):
+        """Return the document data for a date, or None if there is none."""
+        self.refresh()
+        docs = self._index.get(year, {}).get(month, {}).get(day)
+        return docs[0] if docs else None
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_corpus_catalog():
+    """Get the process-wide catalog of config.PARSED_DOCS_DIR."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = CorpusCatalog(config.PARSED_DOCS_DIR, config.CATALOG_REFRESH_INTERVAL)
+    return _catalog
+
+
 def get_documents_data():
     """Extract all documents from year folders and return as list of document data."""
-    parsed_docs_dir = config.PARSED_DOCS_DIR
-    year_dirs = sorted([d for d in parsed_docs_dir.iterdir() if d.is_dir()])
-    
-    documents_data = []
-    for year_dir in year_dirs:
-        # Find PDF files in this year folder
-        pdf_files = [f for f in year_dir.glob("DR_*.pdf") if "_layouts" not in f.name]
-        for pdf_file in pdf_files:
-            day, month, year = parse_doc_name(pdf_file.name)
-            if day is not None:
-                documents_data.append({
-                    'path': year_dir,  # The year folder path
-                    'name': pdf_file.stem,  # Document name without extension (DR_DD_MM_YYYY)
-                    'day': day,
-                    'month': month,
-                    'year': year
-                })
-    
-    return documents_data
-
+    return get_corpus_catalog().documents()
@@ -2,69 +2,176 @@
 Image processing utility functions.
 """
 import io
+import os
+import json
+import hashlib
+from pathlib import Path
 import fitz  # PyMuPDF
 from PIL import Image, ImageDraw
+from loguru import logger
 import config
+from cache_utils import LRUCache
+from pdf_utils import pdf_document
 
 
-def load_pdf_page_as_image(pdf_path, page_number, target_dpi=None, offset_x=None, offset_y=None):
+# Rendered pages shared by every session: {(pdf path, mtime, page, dpi): (img, metadata)}
+_page_cache = LRUCache(config.PAGE_CACHE_MAX_ENTRIES)
+# Highlighted crops shared by every session: {(pdf path, mtime, page, dpi, bbox): img}
+_crop_cache = LRUCache(config.CROP_CACHE_MAX_ENTRIES)
+# Decoded scans of image-only pages: {(pdf path, mtime, page, dpi): (img, placement rect) or False}
+_scan_cache = LRUCache(config.SCAN_CACHE_MAX_ENTRIES)
+
+
+def _page_cache_key(pdf_path, page_number, target_dpi):
+    """Build the cache key for a rendered page, invalidated when the PDF changes."""
+    resolved = Path(pdf_path).resolve()
+    return (str(resolved), resolved.stat().st_mtime_ns, page_number, target_dpi)
+
+
+def _disk_cache_paths(key):
+    """Return the (raw samples, metadata) file paths of a page in the disk tier."""
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    cache_dir = Path(config.PAGE_CACHE_DIR)
+    return cache_dir / f"{digest}.raw", cache_dir / f"{digest}.json"
+
+
+def _load_page_from_disk(key):
+    """Load a rendered page from the disk tier, or None if it is not there."""
+    if config.PAGE_CACHE_DIR is None:
+        return None
+    raw_path, meta_path = _disk_cache_paths(key)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        with open(raw_path, 'rb') as f:
+            samples = f.read()
+        img = Image.frombytes(stored['mode'], (stored['width'], stored['height']), samples)
+    except (OSError, ValueError, KeyError):
+        return None
+    try:
+        # The modification time of the samples file doubles as the last access time for eviction
+        os.utime(raw_path)
+    except OSError:
+        pass
+    return img, stored['metadata']
+
+
+def _evict_disk_cache(max_bytes):
+    """Delete the least recently used pages of the disk tier until it fits in max_bytes."""
+    entries = []
+    total = 0
+    for raw_path in Path(config.PAGE_CACHE_DIR).glob("*.raw"):
+        meta_path = raw_path.with_suffix('.json')
+        try:
+            stat = raw_path.stat()
+            size = stat.st_size + (meta_path.stat().st_size if meta_path.exists() else 0)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, raw_path, meta_path, size))
+        total += size
+    if total <= max_bytes:
+        return
+    for _, raw_path, meta_path, size in sorted(entries):
+        # Metadata first, so readers never find metadata without its samples
+        for path in (meta_path, raw_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not evict page cache entry {path}: {e}")
+        total -= size
+        if total <= max_bytes:
+            break
+
+
+def _save_page_to_disk(key, img, metadata):
+    """Spill a rendered page to the disk tier (best effort)."""
+    if config.PAGE_CACHE_DIR is None:
+        return
+    raw_path, meta_path = _disk_cache_paths(key)
+    try:
+        raw_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write samples first and metadata last so readers never see a partial entry
+        tmp_path = raw_path.with_suffix('.raw.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(img.tobytes())
+        os.replace(tmp_path, raw_path)
+        tmp_path = meta_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'mode': img.mode, 'width': img.width, 'height': img.height,
+                       'metadata': metadata}, f)
+        os.replace(tmp_path, meta_path)
+    except OSError as e:
+        logger.warning(f"Could not write page cache entry {raw_path}: {e}")
+        return
+    _evict_disk_cache(config.PAGE_CACHE_DIR_MAX_BYTES)
+
+
+def pixmap_to_image(pix):
     """
-    Load a specific page from a PDF file and convert it to a PIL Image.
+    Convert a fitz Pixmap to a PIL Image straight from its sample buffer.
+    
+    This avoids the PNG encode/decode round-trip of pix.tobytes("png"); the
+    samples are copied once so the image stays valid after the pixmap is freed.
     
     Args:
-        pdf_path: Path to the PDF file
-        page_number: Page number (1-indexed)
-        target_dpi: Target DPI for rendering (defaults to config.TARGET_DPI)
-        offset_x: X offset for coordinate adjustment (defaults to config.OFFSET_X)
-        offset_y: Y offset for coordinate adjustment (defaults to config.OFFSET_Y)
+        pix: fitz.Pixmap (gray or RGB, with or without alpha)
     
     Returns:
-        tuple: (PIL Image, dict with metadata including img_width, img_height, 
-                rendered_width, rendered_height, page_width_pt, page_height_pt,
-                actual_scale_x, actual_scale_y)
+        PIL Image: Image in 'L', 'LA', 'RGB' or 'RGBA' mode
     """
-    if target_dpi is None:
-        target_dpi = config.TARGET_DPI
-    if offset_x is None:
-        offset_x = config.OFFSET_X
-    if offset_y is None:
-        offset_y = config.OFFSET_Y
-    
-    pdf_doc = fitz.open(str(pdf_path))
-    if page_number > len(pdf_doc):
-        raise ValueError(f"Page {page_number} not found in PDF")
+    if pix.n - pix.alpha == 1:
+        mode = 'LA' if pix.alpha else 'L'
+    elif pix.n - pix.alpha == 3:
+        mode = 'RGBA' if pix.alpha else 'RGB'
+    else:
+        # CMYK and other colorspaces: let PyMuPDF convert to RGB first
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+        mode = 'RGBA' if pix.alpha else 'RGB'
+    return Image.frombytes(mode, (pix.width, pix.height), pix.samples_mv,
+                           'raw', mode, pix.stride)
+
+
+def _render_pdf_page(pdf_path, page_number, target_dpi):
+    """
+    Rasterize a PDF page.
     
-    page = pdf_doc[page_number - 1]  # PDF pages are 0-indexed
-    page_rect = page.rect
+    Returns:
+        tuple: (PIL Image, dict with the rendering metadata, without offsets)
+    """
+    with pdf_document(pdf_path) as pdf_doc:
+        if page_number > len(pdf_doc):
+            raise ValueError(f"Page {page_number} not found in PDF")
     
-    # Get the page dimensions in points
-    page_width_pt = page_rect.width
-    page_height_pt = page_rect.height
+        page = pdf_doc[page_number - 1]  # PDF pages are 0-indexed
+        page_rect = page.rect
     
-    # Calculate scale factor based on target DPI
-    # PyMuPDF default is 72 DPI, so scale_factor = target_dpi / 72
-    # Match the exact processing method: zoom = dpi / 72.0
-    zoom = target_dpi / float(config.DEFAULT_DPI)
-    mat = fitz.Matrix(zoom, zoom)
-    # Use alpha=False to match the original processing
-    pix = page.get_pixmap(matrix=mat, alpha=False)
+        # Get the page dimensions in points
+        page_width_pt = page_rect.width
+        page_height_pt = page_rect.height
     
-    # Get actual rendered dimensions
-    rendered_width = pix.width
-    rendered_height = pix.height
+        # Calculate scale factor based on target DPI
+        # PyMuPDF default is 72 DPI, so scale_factor = target_dpi / 72
+        # Match the exact processing method: zoom = dpi / 72.0
+        zoom = target_dpi / float(config.DEFAULT_DPI)
+        mat = fitz.Matrix(zoom, zoom)
+        # Use alpha=False to match the original processing
+        pix = page.get_pixmap(matrix=mat, alpha=False)
     
-    # Calculate the actual scale factor based on rendered vs PDF dimensions
-    # This accounts for any DPI differences
-    actual_scale_x = rendered_width / page_width_pt
-    actual_scale_y = rendered_height / page_height_pt
+        # Get actual rendered dimensions
+        rendered_width = pix.width
+        rendered_height = pix.height
     
-    img_data = pix.tobytes("png")
-    img = Image.open(io.BytesIO(img_data))
+        # Calculate the actual scale factor based on rendered vs PDF dimensions
+        # This accounts for any DPI differences
+        actual_scale_x = rendered_width / page_width_pt
+        actual_scale_y = rendered_height / page_height_pt
     
-    # Get image dimensions
-    img_width, img_height = img.size
+        img = pixmap_to_image(pix)
     
-    pdf_doc.close()
+        # Get image dimensions
+        img_width, img_height = img.size
     
     metadata = {
         'img_width': img_width,
@@ -75,13 +182,64 @@ def load_pdf_page_as_image(pdf_path, page_number, target_dpi=None, offset_x=None
         'page_height_pt': page_height_pt,
         'actual_scale_x': actual_scale_x,
         'actual_scale_y': actual_scale_y,
-        'offset_x': offset_x,
-        'offset_y': offset_y,
     }
     
     return img, metadata
 
 
+def load_pdf_page_as_image(pdf_path, page_number, target_dpi=None, offset_x=None, offset_y=None):
+    """
+    Load a specific page from a PDF file and convert it to a PIL Image.
+    
+    Rendered pages are kept in a process-wide LRU cache keyed by
+    (pdf path, mtime, page, dpi) and, when config.PAGE_CACHE_DIR is set,
+    spilled to disk (within config.PAGE_CACHE_DIR_MAX_BYTES, least recently used
+    pages evicted first), so repeated calls for the same page do not rasterize again.
+    The returned image is shared and must not be modified in place.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        page_number: Page number (1-indexed)
+        target_dpi: Target DPI for rendering (defaults to config.TARGET_DPI)
+        offset_x: X offset for coordinate adjustment (defaults to config.OFFSET_X)
+        offset_y: Y offset for coordinate adjustment (defaults to config.OFFSET_Y)
+    
+    Returns:
+        tuple: (PIL Image, dict with metadata including img_width, img_height, 
+                rendered_width, rendered_height, page_width_pt, page_height_pt,
+                actual_scale_x, actual_scale_y)
+    """
+    if target_dpi is None:
+        target_dpi = config.TARGET_DPI
+    if offset_x is None:
+        offset_x = config.OFFSET_X
+    if offset_y is None:
+        offset_y = config.OFFSET_Y
+    
+    key = _page_cache_key(pdf_path, page_number, target_dpi)
+    cached = _page_cache.get(key)
+    if cached is None:
+        cached = _load_page_from_disk(key)
+        if cached is None:
+            cached = _render_pdf_page(pdf_path, page_number, target_dpi)
+            _save_page_to_disk(key, *cached)
+        _page_cache.put(key, cached)
+    
+    img, render_metadata = cached
+    metadata = dict(render_metadata)
+    metadata['offset_x'] = offset_x
+    metadata['offset_y'] = offset_y
+    
+    return img, metadata
+
+
+def clear_page_cache():
+    """Drop every rendered page, decoded scan and highlighted crop kept in memory."""
+    _page_cache.clear()
+    _crop_cache.clear()
+    _scan_cache.clear()
+
+
 def crop_and_highlight_bbox(img, bbox, img_metadata):
     """
     Crop image to show only the selected bounding box with highlighting.
@@ -144,16 +302,258 @@ def crop_and_highlight_bbox(img, bbox, img_metadata):
     box_x2 = x2_scaled - crop_x1
     box_y2 = y2_scaled - crop_y1
     
+    return _highlight_box(cropped_img, (box_x1, box_y1, box_x2, box_y2))
+
+
+def _highlight_box(cropped_img, box):
+    """Draw the semi-transparent bbox highlight over a crop."""
     # Create a transparent overlay for the bounding box
     overlay = Image.new('RGBA', cropped_img.size, (0, 0, 0, 0))
     draw_overlay = ImageDraw.Draw(overlay)
     
     # Draw semi-transparent light blue rectangle
-    draw_overlay.rectangle([box_x1, box_y1, box_x2, box_y2], 
-                          fill=config.BBOX_OVERLAY_COLOR, outline=None)
+    draw_overlay.rectangle(list(box), fill=config.BBOX_OVERLAY_COLOR, outline=None)
     
     # Composite the overlay onto the cropped image
-    cropped_img = Image.alpha_composite(cropped_img.convert('RGBA'), overlay).convert('RGB')
+    return Image.alpha_composite(cropped_img.convert('RGBA'), overlay).convert('RGB')
+
+
+def bbox_to_page_rect(bbox, page_rect, base_dpi=None, offset_x=None, offset_y=None):
+    """
+    Map a bbox to PDF page coordinates (points).
+    
+    Mirrors the mapping of crop_and_highlight_bbox: normalized 0-999 coordinates
+    are scaled to the page size, larger ones are taken as points. Offsets are in
+    pixels at base_dpi, like the offsets of load_pdf_page_as_image.
     
-    return cropped_img
+    Args:
+        bbox: Tuple of (x1, y1, x2, y2) coordinates
+        page_rect: fitz.Rect of the page
+        base_dpi: DPI the offsets are expressed in (defaults to config.TARGET_DPI)
+        offset_x: X offset in pixels (defaults to config.OFFSET_X)
+        offset_y: Y offset in pixels (defaults to config.OFFSET_Y)
+    
+    Returns:
+        fitz.Rect: The bbox in page coordinates, clipped to the page
+    """
+    if base_dpi is None:
+        base_dpi = config.TARGET_DPI
+    if offset_x is None:
+        offset_x = config.OFFSET_X
+    if offset_y is None:
+        offset_y = config.OFFSET_Y
+    base_scale = base_dpi / float(config.DEFAULT_DPI)
+    
+    x1, y1, x2, y2 = bbox
+    if max(x1, y1, x2, y2) <= 999:
+        # Normalized to 0-999
+        scale_x = page_rect.width / 999
+        scale_y = page_rect.height / 999
+    else:
+        scale_x = scale_y = 1.0
+    rect = fitz.Rect(
+        page_rect.x0 + x1 * scale_x + offset_x / base_scale,
+        page_rect.y0 + y1 * scale_y + offset_y / base_scale,
+        page_rect.x0 + x2 * scale_x + offset_x / base_scale,
+        page_rect.y0 + y2 * scale_y + offset_y / base_scale,
+    )
+    return rect & page_rect
+
+
+def _find_page_scan(page):
+    """
+    Find the embedded scan of an image-only page.
+    
+    Returns:
+        tuple: (image xref, fitz.Rect the image is placed at), or None for
+        pages with text, vector graphics, several images, masks or a rotated placement
+    """
+    images = page.get_images(full=True)
+    if len(images) != 1 or images[0][1]:
+        return None
+    infos = page.get_image_info()
+    if len(infos) != 1 or infos[0]['has-mask']:
+        return None
+    a, b, c, d, _, _ = infos[0]['transform']
+    if b or c or a <= 0 or d <= 0:
+        return None
+    if page.get_text('words') or page.get_drawings():
+        return None
+    return images[0][0], fitz.Rect(infos[0]['bbox'])
+
+
+def _decode_scan(pdf_doc, xref, min_size):
+    """
+    Decode an embedded scan at its native resolution, without resampling.
+    
+    Plain RGB/gray JPEG streams are decoded by PIL with draft mode, which lets
+    the decoder skip DCT scales finer than min_size needs. Everything else
+    (Flate, JBIG2, CCITT, indexed or CMYK color) is decoded by MuPDF.
+    
+    Args:
+        pdf_doc: fitz.Document
+        xref: Image xref
+        min_size: (width, height) the decoded image must not be smaller than
+    
+    Returns:
+        PIL Image: The decoded scan
+    """
+    is_jpeg = pdf_doc.xref_get_key(xref, 'Filter') == ('name', '/DCTDecode')
+    plain_colors = pdf_doc.xref_get_key(xref, 'ColorSpace')[1] in ('/DeviceRGB', '/DeviceGray')
+    if is_jpeg and plain_colors and pdf_doc.xref_get_key(xref, 'Decode')[0] == 'null':
+        img = Image.open(io.BytesIO(pdf_doc.xref_stream_raw(xref)))
+        if img.mode in ('RGB', 'L'):
+            img.draft(img.mode, min_size)
+            img.load()
+            return img
+    return pixmap_to_image(fitz.Pixmap(pdf_doc, xref))
+
+
+def _get_page_scan(pdf_doc, page, key, zoom):
+    """
+    Get the decoded scan of an image-only page, decoding it once per page.
+    
+    Returns:
+        tuple: (PIL Image, fitz.Rect the scan is placed at), or None if the page is not a plain scan
+    """
+    scan = _scan_cache.get(key)
+    if scan is None:
+        found = _find_page_scan(page)
+        if found is None:
+            scan = False
+        else:
+            xref, placement = found
+            min_size = (int(placement.width * zoom), int(placement.height * zoom))
+            scan = (_decode_scan(pdf_doc, xref, min_size), placement)
+        _scan_cache.put(key, scan)
+    return scan or None
+
+
+def _crop_scan(scan, placement, irect, zoom):
+    """
+    Resample the part of a decoded scan covering a pixel rectangle of the page at zoom.
+    
+    Args:
+        scan: Decoded scan (PIL Image)
+        placement: fitz.Rect the scan is placed at on the page
+        irect: fitz.IRect of the crop, in page pixels at zoom
+        zoom: Page pixels per point
+    
+    Returns:
+        PIL Image: RGB crop of irect's size
+    """
+    scale_x = scan.width / placement.width
+    scale_y = scan.height / placement.height
+    source_box = (
+        min(max((irect.x0 / zoom - placement.x0) * scale_x, 0), scan.width),
+        min(max((irect.y0 / zoom - placement.y0) * scale_y, 0), scan.height),
+        min(max((irect.x1 / zoom - placement.x0) * scale_x, 0), scan.width),
+        min(max((irect.y1 / zoom - placement.y0) * scale_y, 0), scan.height),
+    )
+    # Area averaging when reducing (as MuPDF does), bicubic above the native resolution
+    resample = Image.BOX if scale_x >= zoom else Image.BICUBIC
+    crop = scan.resize((irect.width, irect.height), resample, box=source_box)
+    return crop if crop.mode == 'RGB' else crop.convert('RGB')
+
+
+def render_bbox_crop(pdf_path, page_number, bbox, target_dpi=None):
+    """
+    Render the highlighted crop of a bbox by rasterizing only its padded clip rectangle.
+    
+    Produces the same framing as load_pdf_page_as_image + crop_and_highlight_bbox
+    (config.CROP_PADDING is in pixels at config.TARGET_DPI), but the cost scales
+    with the box area instead of the page area. A higher target_dpi gives
+    sharper crops of small print.
+    
+    With config.SCAN_EXTRACTION, pages that are a single embedded scan are
+    not rasterized at all: the scan is decoded once per page and every crop
+    is resampled straight from its native pixels. Mixed-content pages are
+    rendered with get_pixmap.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        page_number: Page number (1-indexed)
+        bbox: Tuple of (x1, y1, x2, y2) coordinates
+        target_dpi: Rendering DPI (defaults to config.CLIP_RENDER_DPI, then config.TARGET_DPI)
+    
+    Returns:
+        PIL Image: Cropped and highlighted image
+    """
+    if target_dpi is None:
+        target_dpi = config.CLIP_RENDER_DPI or config.TARGET_DPI
+    base_scale = config.TARGET_DPI / float(config.DEFAULT_DPI)
+    zoom = target_dpi / float(config.DEFAULT_DPI)
+    scan_key = _page_cache_key(pdf_path, page_number, target_dpi)
+    
+    with pdf_document(pdf_path) as pdf_doc:
+        if page_number > len(pdf_doc):
+            raise ValueError(f"Page {page_number} not found in PDF")
+        page = pdf_doc[page_number - 1]
+        if page.rotation:
+            # Clip rectangles are in unrotated page space; use the full-page path
+            rotated = True
+        else:
+            rotated = False
+            page_rect = page.rect
+            box_rect = bbox_to_page_rect(bbox, page_rect)
+            padding = config.CROP_PADDING / base_scale
+            clip = fitz.Rect(box_rect.x0 - padding, box_rect.y0 - padding,
+                             box_rect.x1 + padding, box_rect.y1 + padding) & page_rect
+            # Pixel rectangle of the crop, rounded outwards like get_pixmap does
+            irect = (clip * fitz.Matrix(zoom, zoom)).irect
+            scan = _get_page_scan(pdf_doc, page, scan_key, zoom) if config.SCAN_EXTRACTION else None
+            if scan is not None and scan[1].contains(clip):
+                cropped_img = _crop_scan(scan[0], scan[1], irect, zoom)
+            else:
+                pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+                cropped_img = pixmap_to_image(pix)
+    
+    if rotated:
+        img, img_metadata = load_pdf_page_as_image(pdf_path, page_number)
+        return crop_and_highlight_bbox(img, bbox, img_metadata)
+    
+    # Highlight in crop pixels
+    box = (box_rect.x0 * zoom - irect.x0, box_rect.y0 * zoom - irect.y0,
+           box_rect.x1 * zoom - irect.x0, box_rect.y1 * zoom - irect.y0)
+    return _highlight_box(cropped_img, box)
+
+
+def _crop_cache_key(pdf_path, page_number, bbox):
+    """Build the cache key for a highlighted bbox crop."""
+    crop_dpi = (config.CLIP_RENDER_DPI or config.TARGET_DPI) if config.CLIP_RENDERING else config.TARGET_DPI
+    return _page_cache_key(pdf_path, page_number, crop_dpi) + (tuple(bbox),)
 
+
+def is_bbox_crop_cached(pdf_path, page_number, bbox):
+    """Check whether the highlighted crop of a bbox is already in memory."""
+    return _crop_cache_key(pdf_path, page_number, bbox) in _crop_cache
+
+
+def get_bbox_crop(pdf_path, page_number, bbox):
+    """
+    Get the cropped and highlighted image of a bbox of a PDF page.
+    
+    With config.CLIP_RENDERING only the padded box is rasterized (see
+    render_bbox_crop); otherwise the crop is cut from the rendered page.
+    Crops are cached process-wide, so boxes prepared by the prefetcher or
+    visited before are returned without rasterizing or compositing again.
+    The returned image is shared and must not be modified in place.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        page_number: Page number (1-indexed)
+        bbox: Tuple of (x1, y1, x2, y2) coordinates
+    
+    Returns:
+        PIL Image: Cropped and highlighted image
+    """
+    key = _crop_cache_key(pdf_path, page_number, bbox)
+    crop = _crop_cache.get(key)
+    if crop is None:
+        if config.CLIP_RENDERING:
+            crop = render_bbox_crop(pdf_path, page_number, bbox)
+        else:
+            img, img_metadata = load_pdf_page_as_image(pdf_path, page_number)
+            crop = crop_and_highlight_bbox(img, bbox, img_metadata)
+        _crop_cache.put(key, crop)
+    return crop
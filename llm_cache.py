@@ -0,0 +1,169 @@
+"""
+Persistent, content-addressed cache of vision-LLM transcriptions.
+
+A transcription is keyed by the SHA-256 of the encoded crop together with
+the prompt, the model and the temperature, so the same box (or an identical
+crop such as the "DIÁRIO DO GOVÊRNO" masthead of every issue) is only sent
+to the API once. Entries live in their own SQLite file (config.LLM_CACHE_PATH)
+and survive restarts; a small in-memory LRU sits in front of it. Entries
+older than config.LLM_CACHE_MAX_AGE_DAYS are dropped, and the least recently
+used ones are evicted beyond config.LLM_CACHE_MAX_ENTRIES.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+import config
+from cache_utils import LRUCache
+
+
+CREATE_CACHE_SQL = '''
+    CREATE TABLE IF NOT EXISTS transcriptions (
+        key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        text TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    )
+'''
+CREATE_ACCESSED_INDEX_SQL = '''
+    CREATE INDEX IF NOT EXISTS idx_transcriptions_accessed_at
+    ON transcriptions (accessed_at)
+'''
+SELECT_TRANSCRIPTION_SQL = 'SELECT text, created_at FROM transcriptions WHERE key = ?'
+TOUCH_TRANSCRIPTION_SQL = 'UPDATE transcriptions SET accessed_at = ? WHERE key = ?'
+UPSERT_TRANSCRIPTION_SQL = '''
+    INSERT INTO transcriptions (key, model, text, created_at, accessed_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        text = excluded.text, created_at = excluded.created_at, accessed_at = excluded.accessed_at
+'''
+DELETE_EXPIRED_SQL = 'DELETE FROM transcriptions WHERE created_at < ?'
+DELETE_LEAST_RECENT_SQL = '''
+    DELETE FROM transcriptions WHERE key IN (
+        SELECT key FROM transcriptions ORDER BY accessed_at LIMIT ?
+    )
+'''
+
+# Evict once every this many writes instead of on every write
+_EVICT_EVERY = 100
+
+
+def transcription_key(img_base64, prompt, model, temperature):
+    """Return the cache key of a transcription request."""
+    digest = hashlib.sha256()
+    for part in (img_base64, prompt, model or '', repr(float(temperature))):
+        encoded = part.encode('utf-8')
+        # Length-prefixed, so the fields cannot run into each other
+        digest.update(len(encoded).to_bytes(8, 'little'))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """
+    SQLite-backed transcription cache with an in-memory LRU in front.
+
+    Args:
+        db_path: Path of the cache database
+        max_entries: Maximum number of entries kept on disk
+        max_age_days: Entries older than this are treated as missing and dropped
+        memory_entries: Number of entries kept in memory
+    """
+
+    def __init__(self, db_path, max_entries, max_age_days, memory_entries=1024):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400 if max_age_days else None
+        self._memory = LRUCache(memory_entries)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(CREATE_CACHE_SQL)
+            conn.execute(CREATE_ACCESSED_INDEX_SQL)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _is_expired(self, created_at, now):
+        return self.max_age_seconds is not None and now - created_at > self.max_age_seconds
+
+    def get(self, key):
+        """Return the cached transcription of a key, or None."""
+        now = time.time()
+        cached = self._memory.get(key)
+        if cached is not None:
+            text, created_at = cached
+            if not self._is_expired(created_at, now):
+                return text
+            self._memory.pop(key)
+
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(SELECT_TRANSCRIPTION_SQL, (key,)).fetchone()
+            if row is None or self._is_expired(row[1], now):
+                return None
+            with conn:
+                conn.execute(TOUCH_TRANSCRIPTION_SQL, (now, key))
+        self._memory.put(key, row)
+        return row[0]
+
+    def put(self, key, model, text):
+        """Store a transcription."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(UPSERT_TRANSCRIPTION_SQL, (key, model or '', text, now, now))
+            self._writes += 1
+            if self._writes % _EVICT_EVERY == 1:
+                self._evict(conn, now)
+        self._memory.put(key, (text, now))
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then the least recently used ones beyond max_entries."""
+        with conn:
+            if self.max_age_seconds is not None:
+                conn.execute(DELETE_EXPIRED_SQL, (now - self.max_age_seconds,))
+            if self.max_entries:
+                excess = conn.execute('SELECT COUNT(*) FROM transcriptions').fetchone()[0] - self.max_entries
+                if excess > 0:
+                    conn.execute(DELETE_LEAST_RECENT_SQL, (excess,))
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM transcriptions')
+        self._memory.clear()
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_transcription_cache():
+    """Get the process-wide transcription cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TranscriptionCache(
+                    config.LLM_CACHE_PATH, config.LLM_CACHE_MAX_ENTRIES, config.LLM_CACHE_MAX_AGE_DAYS
+                )
+    return _cache
+
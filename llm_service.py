@@ -0,0 +1,191 @@
+"""
+Background vision-LLM correction service.
+
+Transcription requests run on an asyncio event loop in a daemon thread, so
+the Streamlit script never blocks on the API: the UI submits bbox crops and
+polls their status on later reruns. Requests run concurrently with bounded
+parallelism (config.LLM_MAX_CONCURRENCY), are spread out by a rate limiter
+(config.LLM_REQUESTS_PER_MINUTE) and are retried with exponential backoff on
+rate limits, timeouts, connection and server errors. The blocking OpenAI
+client calls run in worker threads (asyncio.to_thread). Crops transcribed
+before are answered from the persistent transcription cache (llm_cache.py)
+without taking a request slot.
+
+Results are kept per bbox key (e.g. (document, page, bbox number)) as dicts:
+    {'status': 'queued' | 'running' | 'done' | 'error', 'text': str | None,
+     'error': str | None, 'updated_at': float}
+"""
+import asyncio
+import random
+import threading
+import time
+from loguru import logger
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+import config
+from api_utils import create_openrouter_client, encode_image_for_vision, request_transcription
+from cache_utils import LRUCache
+from llm_cache import get_transcription_cache, transcription_key
+
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_ERROR = 'error'
+
+# Errors worth retrying; anything else (bad request, authentication, ...) fails at once
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+
+class _RateLimiter:
+    """Spaces request starts at least 60 / requests_per_minute seconds apart."""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_start = 0.0
+        self._lock = None
+
+    async def wait(self):
+        if not self.interval:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class CorrectionService:
+    """
+    Asynchronous, rate-limited vision-LLM transcription of bbox crops.
+
+    Args:
+        client_factory: Callable returning an OpenAI-compatible client (or None if unavailable)
+        max_concurrency: Maximum number of requests in flight
+        requests_per_minute: Maximum number of request starts per minute (0 = unlimited)
+        max_retries: Retries of a request failing with a retryable error
+        retry_backoff: Delay before the first retry, doubled on every further attempt
+        cache: TranscriptionCache to use instead of the process-wide one
+    """
+
+    def __init__(self, client_factory=create_openrouter_client, max_concurrency=None,
+                 requests_per_minute=None, max_retries=None, retry_backoff=None, cache=None):
+        self.client_factory = client_factory
+        self.cache = cache
+        self.max_concurrency = max_concurrency or config.LLM_MAX_CONCURRENCY
+        self.max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = config.LLM_RETRY_BACKOFF_SECONDS if retry_backoff is None else retry_backoff
+        self._rate_limiter = _RateLimiter(
+            config.LLM_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+        )
+        self._results = LRUCache(config.LLM_RESULTS_MAX_ENTRIES)
+        self._lock = threading.Lock()
+        self._client = None
+        self._loop = None
+        self._semaphore = None
+
+    def _ensure_loop(self):
+        """Start the event loop thread on first use."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="llm-service", daemon=True)
+                thread.start()
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._loop = loop
+            return self._loop
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self.client_factory()
+            return self._client
+
+    def _set_status(self, key, status, text=None, error=None):
+        self._results.put(key, {'status': status, 'text': text, 'error': error, 'updated_at': time.time()})
+
+    def submit(self, key, load_image, force=False):
+        """
+        Queue the transcription of a bbox crop.
+
+        Args:
+            key: Hashable bbox key, e.g. (document, page, bbox number)
+            load_image: Callable returning the PIL crop; called in a worker thread
+            force: Resubmit even if the bbox already has a result or is pending
+
+        Returns:
+            concurrent.futures.Future: Completes when the result is stored, or None if nothing was queued
+        """
+        current = self._results.get(key)
+        if current is not None and not force and current['status'] != STATUS_ERROR:
+            return None
+        self._set_status(key, STATUS_QUEUED)
+        return asyncio.run_coroutine_threadsafe(self._process(key, load_image), self._ensure_loop())
+
+    async def _process(self, key, load_image):
+        try:
+            img_base64 = await asyncio.to_thread(lambda: encode_image_for_vision(load_image()))
+            model = config.DEFAULT_VISION_MODEL
+            temperature = config.LLM_TEMPERATURE
+            cache = self.cache or get_transcription_cache()
+            cache_key = transcription_key(img_base64, config.PROMPT_IMAGE, model, temperature)
+            text = await asyncio.to_thread(cache.get, cache_key)
+            if text is None:
+                async with self._semaphore:
+                    self._set_status(key, STATUS_RUNNING)
+                    text = await self._request_with_retries(img_base64, model, temperature)
+                await asyncio.to_thread(cache.put, cache_key, model, text)
+            self._set_status(key, STATUS_DONE, text=text)
+            logger.info(f"Texto obtido com LLM para {key}: {text}")
+        except Exception as e:
+            self._set_status(key, STATUS_ERROR, error=str(e))
+            logger.error(f"Erro ao processar imagem com LLM para {key}: {e}")
+
+    async def _request_with_retries(self, img_base64, model, temperature):
+        client = await asyncio.to_thread(self._get_client)
+        if client is None:
+            raise RuntimeError("OpenRouter API key not found")
+        for attempt in range(self.max_retries + 1):
+            await self._rate_limiter.wait()
+            try:
+                return await asyncio.to_thread(request_transcription, client, img_base64, model, temperature)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                # Exponential backoff with jitter, so concurrent retries do not resynchronize
+                delay = self.retry_backoff * (2 ** attempt) * (0.5 + random.random())
+                logger.warning(f"LLM request failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def get(self, key):
+        """Return the status dict of a bbox, or None if it was never submitted."""
+        return self._results.get(key)
+
+    def get_many(self, keys):
+        """Return {key: status dict} for the submitted keys among keys."""
+        results = {}
+        for key in keys:
+            result = self._results.get(key)
+            if result is not None:
+                results[key] = result
+        return results
+
+    def discard(self, key):
+        """Forget the result of a bbox."""
+        self._results.pop(key)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_correction_service():
+    """Get the process-wide correction service, shared by all sessions."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = CorrectionService()
+    return _service
@@ -0,0 +1,186 @@
+"""
+Annotation metrics utility functions.
+
+Statistics are read from the summary tables the database keeps up to date on
+every write (error counts and differing/reference word and character counts
+per document, page and error type), so no annotation is rescored when the
+statistics view opens. WER and CER are ratios of those summed counts; OCR
+word counts come from the parsed-document index. Per-error WER and CER come
+from the counts stored with each error (get_error_metrics).
+"""
+from typing import Dict, NamedTuple
+import numpy as np
+import pandas as pd
+import config
+from cache_utils import LRUCache
+from database import get_error_type_stats, get_document_stats, get_page_stats, get_error_scores
+from document_store import get_document
+from text_alignment import error_rate
+
+
+# Counts summed by the summary tables
+_COUNT_COLUMNS = ['differing_words', 'reference_words', 'differing_chars', 'reference_chars']
+
+# Columns of the per-error frame, in order
+ERROR_METRIC_COLUMNS = ['id', 'document_name', 'page_number', 'bbox_number', 'error_type'] + _COUNT_COLUMNS + ['wer', 'cer']
+
+
+class AnnotationMetrics(NamedTuple):
+    """Aggregated annotation metrics."""
+    by_document: pd.DataFrame
+    by_error_type: pd.DataFrame
+    totals: Dict
+
+
+def _rate(distance, reference_length):
+    """Vectorized text_alignment.error_rate: distance / reference length (1.0 when there is no reference)."""
+    distance = np.asarray(distance, dtype=float)
+    reference_length = np.asarray(reference_length, dtype=float)
+    return np.divide(distance, reference_length,
+                     out=(distance > 0).astype(float), where=reference_length > 0)
+
+
+def get_error_metrics(document_name=None) -> pd.DataFrame:
+    """
+    Get the WER and CER of every error annotation, optionally of one document.
+
+    Scores come from the counts stored with each error, so nothing is rescored.
+
+    Returns:
+        pd.DataFrame: ERROR_METRIC_COLUMNS, one row per error
+    """
+    frame = pd.DataFrame(get_error_scores(document_name), columns=ERROR_METRIC_COLUMNS[:-2])
+    frame['wer'] = _rate(frame['differing_words'], frame['reference_words'])
+    frame['cer'] = _rate(frame['differing_chars'], frame['reference_chars'])
+    return frame
+
+
+def summarize_error_stats(rows, keys, ocr_words: pd.Series = None) -> pd.DataFrame:
+    """
+    Turn summary-table rows (one per group and error type) into one row per group.
+
+    Args:
+        rows: Rows from database.get_document_stats, get_page_stats or get_error_type_stats
+        keys: Column name or list of column names identifying a group
+        ocr_words: Optional OCR word counts indexed like the groups; adds the
+            ocr_words column and the error_pct of the OCR words in error
+
+    Returns:
+        pd.DataFrame: One row per group with the error count, the summed word and
+        character counts, WER/CER (summed distance over summed reference length),
+        and the error count and differing words of every error type
+        (<type>_errors, <type>_words columns)
+    """
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    type_column = [] if 'error_type' in keys else ['error_type']
+    frame = pd.DataFrame(list(rows), columns=keys + type_column + ['error_count'] + _COUNT_COLUMNS)
+    error_types = list(config.ERROR_TYPES) + sorted(set(frame['error_type']) - set(config.ERROR_TYPES))
+    # Per-error-type columns, so one grouped sum yields every breakdown
+    values = {key: frame[key] for key in keys}
+    values['errors'] = frame['error_count'].astype(np.int64)
+    for column in _COUNT_COLUMNS:
+        values[column] = frame[column].astype(np.int64)
+    for error_type in error_types:
+        of_type = (frame['error_type'] == error_type).to_numpy()
+        values[f'{error_type}_errors'] = np.where(of_type, values['errors'], 0)
+        values[f'{error_type}_words'] = np.where(of_type, values['differing_words'], 0)
+
+    summary = pd.DataFrame(values).groupby(keys, sort=True).sum()
+    summary['wer'] = _rate(summary['differing_words'], summary['reference_words'])
+    summary['cer'] = _rate(summary['differing_chars'], summary['reference_chars'])
+    if ocr_words is not None:
+        summary['ocr_words'] = ocr_words.reindex(summary.index).fillna(0).astype(np.int64)
+        summary['error_pct'] = _rate(summary['differing_words'], summary['ocr_words']) * 100
+    return summary.reset_index()
+
+
+def _find_document_mmd(document_name):
+    """Return the _det.mmd file of a document folder in config.PARSED_DOCS_DIR, or None."""
+    doc_dir = config.PARSED_DOCS_DIR / document_name
+    if not doc_dir.is_dir():
+        return None
+    return next(iter(sorted(doc_dir.glob("DR_*_det.mmd"))), None)
+
+
+# OCR word counts of parsed documents: {(mmd path, mtime): (document words, {page_num: words})}
+_word_counts_cache = LRUCache(config.METRICS_WORD_COUNT_CACHE_ENTRIES)
+
+
+def _get_word_counts(document_name):
+    """Return (document words, {page_num: words}) of a document, or None if it is not parsed."""
+    mmd_path = _find_document_mmd(document_name)
+    if mmd_path is None:
+        return None
+    key = (str(mmd_path), mmd_path.stat().st_mtime_ns)
+    counts = _word_counts_cache.get(key)
+    if counts is None:
+        document = get_document(mmd_path)
+        counts = (document.word_count(),
+                  {page_num: document.word_count(page_num) for page_num in document.page_numbers})
+        _word_counts_cache.put(key, counts)
+    return counts
+
+
+def get_document_word_counts(document_names) -> pd.Series:
+    """
+    Look up the OCR word counts of documents.
+
+    Counts come from the parsed-document index, so no document is re-tokenized.
+
+    Returns:
+        pd.Series: Word counts indexed by document_name (documents that are not parsed are left out)
+    """
+    words = {}
+    for document_name in document_names:
+        counts = _get_word_counts(document_name)
+        if counts is not None:
+            words[document_name] = counts[0]
+    series = pd.Series(words, dtype=np.int64)
+    series.index.name = 'document_name'
+    return series
+
+
+def get_page_word_counts(document_name) -> pd.Series:
+    """Look up the OCR word counts of the pages of a document, indexed by page_number."""
+    counts = _get_word_counts(document_name)
+    series = pd.Series(counts[1] if counts is not None else {}, dtype=np.int64)
+    series.index.name = 'page_number'
+    return series
+
+
+def get_annotation_metrics() -> AnnotationMetrics:
+    """
+    Get the metrics of every annotation in the database, by document and by error type.
+
+    Only the summary tables are read, so the cost does not grow with the number of annotations.
+    """
+    document_rows = get_document_stats()
+    document_names = sorted({row['document_name'] for row in document_rows})
+    document_words = get_document_word_counts(document_names)
+
+    by_document = summarize_error_stats(document_rows, 'document_name', document_words)
+    by_error_type = summarize_error_stats(get_error_type_stats(), 'error_type')
+
+    # OCR words only of the documents that have errors
+    ocr_words = int(document_words.sum())
+    sums = {column: int(by_document[column].sum()) for column in ['errors'] + _COUNT_COLUMNS}
+    totals = {
+        'errors': sums['errors'],
+        'documents': len(by_document),
+        'ocr_words': ocr_words,
+        'differing_words': sums['differing_words'],
+        'error_pct': sums['differing_words'] / ocr_words * 100 if ocr_words else 0.0,
+        'wer': error_rate(sums['differing_words'], sums['reference_words']),
+        'cer': error_rate(sums['differing_chars'], sums['reference_chars']),
+    }
+    for error_type in config.ERROR_TYPES:
+        totals[f'{error_type}_errors'] = int(by_document[f'{error_type}_errors'].sum())
+        totals[f'{error_type}_words'] = int(by_document[f'{error_type}_words'].sum())
+
+    return AnnotationMetrics(by_document, by_error_type, totals)
+
+
+def get_page_metrics(document_name) -> pd.DataFrame:
+    """Get the metrics of the annotations of a document, one row per page (see summarize_error_stats)."""
+    return summarize_error_stats(get_page_stats(document_name), 'page_number',
+                                 get_page_word_counts(document_name))
@@ -0,0 +1,307 @@
+"""
+Binary index cache for parsed .mmd files.
+
+Parsing a _det.mmd runs the full tokenizer over the whole file. The index is
+a sidecar file (DR_DD_MM_YYYY_det.mmd.idx) written on the first load and
+keyed by the source file's size and mtime. It holds compact per-page bbox
+coordinate arrays plus offsets into a UTF-8 text blob, along with the OCR
+word counts per bbox, page and document. Loading it is an mmap plus
+O(pages) header work, and bbox texts are only decoded when a page is accessed.
+
+Layout (native byte order, every section aligned to 8 bytes):
+    header          _HEADER struct
+    pages           uint32[num_pages * 3]      (page_num, first_entry, entry_count)
+    coordinates     int16|int32[num_entries * 4]
+    categories      uint8[num_entries]         (index into category names, 255 = none)
+    text offsets    uint32[num_entries + 1]    (into the text blob)
+    word counts     uint32[num_entries]        (text_utils.count_words of each bbox)
+    page words      uint32[num_pages]          (word count of each page)
+    category names  UTF-8 JSON list
+    text blob       UTF-8
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+from pathlib import Path
+from loguru import logger
+import config
+from parser import iter_mmd_pages
+from text_utils import count_words
+
+
+INDEX_MAGIC = b'MMDX'
+INDEX_VERSION = 2
+
+# magic, version, byte order, coordinate typecode, source size, source mtime,
+# num pages, num entries, document word count, then (offset, length) of the 8 sections
+_HEADER = struct.Struct('<4sIcc2xQqIIQ16Q')
+_NO_CATEGORY = 255
+_BYTE_ORDER = b'l' if sys.byteorder == 'little' else b'b'
+
+
+def get_index_path(mmd_path):
+    """Return the sidecar index path of an .mmd file."""
+    mmd_path = Path(mmd_path)
+    return mmd_path.with_name(mmd_path.name + config.MMD_INDEX_SUFFIX)
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+def build_index_bytes(mmd_path, source_stat=None):
+    """Parse an .mmd file and serialize it to the binary index format."""
+    if source_stat is None:
+        source_stat = os.stat(mmd_path)
+
+    pages = array('I')
+    coordinates = []
+    categories = array('B')
+    text_offsets = array('I', [0])
+    word_counts = array('I')
+    page_words = array('I')
+    category_names = []
+    texts = []
+    text_size = 0
+
+    for page_num, bboxes in iter_mmd_pages(mmd_path, include_category=True):
+        pages.extend((page_num, len(categories), len(bboxes)))
+        page_word_count = 0
+        for bbox, text, category in bboxes:
+            coordinates.extend(bbox)
+            if category is None:
+                categories.append(_NO_CATEGORY)
+            else:
+                if category not in category_names:
+                    category_names.append(category)
+                categories.append(category_names.index(category))
+            encoded = text.encode('utf-8')
+            texts.append(encoded)
+            text_size += len(encoded)
+            text_offsets.append(text_size)
+            words = count_words(text)
+            word_counts.append(words)
+            page_word_count += words
+        page_words.append(page_word_count)
+
+    if len(category_names) >= _NO_CATEGORY:
+        raise ValueError(f"Too many layout categories in {mmd_path}")
+
+    # Coordinates are normalized to 0-999; fall back to int32 for pixel coordinates
+    coord_typecode = 'h' if all(-32768 <= c <= 32767 for c in coordinates) else 'i'
+    sections = [
+        pages.tobytes(),
+        array(coord_typecode, coordinates).tobytes(),
+        categories.tobytes(),
+        text_offsets.tobytes(),
+        word_counts.tobytes(),
+        page_words.tobytes(),
+        json.dumps(category_names).encode('utf-8'),
+        b''.join(texts),
+    ]
+
+    offset = _align(_HEADER.size)
+    section_fields = []
+    for section in sections:
+        section_fields.extend((offset, len(section)))
+        offset = _align(offset + len(section))
+
+    buffer = bytearray(offset)
+    _HEADER.pack_into(
+        buffer, 0, INDEX_MAGIC, INDEX_VERSION, _BYTE_ORDER, coord_typecode.encode('ascii'),
+        source_stat.st_size, source_stat.st_mtime_ns, len(pages) // 3, len(categories),
+        sum(page_words), *section_fields
+    )
+    for section, section_offset in zip(sections, section_fields[::2]):
+        buffer[section_offset:section_offset + len(section)] = section
+    return bytes(buffer)
+
+
+class IndexedMMD(Mapping):
+    """
+    Read-only view of an indexed .mmd file.
+
+    Behaves like the dictionary returned by parser.parse_mmd_file
+    ({page_num: [(bbox, text), ...]}), but bbox texts are decoded lazily
+    from the memory-mapped index when a page is accessed.
+    """
+
+    def __init__(self, buffer, mapped_file=None):
+        self._mmap = mapped_file
+        self._view = memoryview(buffer)
+        header = _HEADER.unpack_from(self._view, 0)
+        (_, _, _, coord_typecode, self.source_size, self.source_mtime_ns,
+         num_pages, self.num_entries, self.total_words) = header[:9]
+        sections = [self._view[offset:offset + length]
+                    for offset, length in zip(header[9::2], header[10::2])]
+        (pages, coordinates, categories, text_offsets, word_counts, page_words,
+         category_names, self._text) = sections
+
+        self._coordinates = coordinates.cast(coord_typecode.decode('ascii'))
+        self._categories = categories
+        self._text_offsets = text_offsets.cast('I')
+        self._word_counts = word_counts.cast('I')
+        self._category_names = json.loads(bytes(category_names).decode('utf-8'))
+        page_table = pages.cast('I')
+        page_word_table = page_words.cast('I')
+        # {page_num: (first_entry, entry_count)}
+        self._pages = {
+            page_table[i * 3]: (page_table[i * 3 + 1], page_table[i * 3 + 2])
+            for i in range(num_pages)
+        }
+        # {page_num: word count}
+        self._page_words = {page_table[i * 3]: page_word_table[i] for i in range(num_pages)}
+        page_table.release()
+        page_word_table.release()
+
+    def get_page(self, page_num, include_category=False):
+        """
+        Return the bboxes of a page as a list of (bbox, text) tuples,
+        or (bbox, text, category) tuples when include_category is True.
+        """
+        first, count = self._pages[page_num]
+        coordinates = self._coordinates
+        offsets = self._text_offsets
+        entries = []
+        for entry in range(first, first + count):
+            bbox = list(coordinates[entry * 4:entry * 4 + 4])
+            text = str(self._text[offsets[entry]:offsets[entry + 1]], 'utf-8')
+            if include_category:
+                category_id = self._categories[entry]
+                category = None if category_id == _NO_CATEGORY else self._category_names[category_id]
+                entries.append((bbox, text, category))
+            else:
+                entries.append((bbox, text))
+        return entries
+
+    def word_count(self, page_num=None):
+        """Return the OCR word count of a page, or of the whole document."""
+        if page_num is None:
+            return self.total_words
+        return self._page_words[page_num]
+
+    def page_size(self, page_num):
+        """Return the number of bboxes of a page without decoding it."""
+        return self._pages[page_num][1]
+
+    def __getitem__(self, page_num):
+        return self.get_page(page_num)
+
+    def __iter__(self):
+        return iter(self._pages)
+
+    def __len__(self):
+        return len(self._pages)
+
+    def __contains__(self, page_num):
+        return page_num in self._pages
+
+    def close(self):
+        """Release the memory map."""
+        for view in (self._coordinates, self._categories, self._text_offsets, self._word_counts,
+                     self._text, self._view):
+            view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _is_current(index_file, source_stat):
+    """Check an index file's header against the source .mmd file."""
+    header = index_file.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return False
+    magic, version, byte_order, _, size, mtime_ns = _HEADER.unpack(header)[:6]
+    return (magic == INDEX_MAGIC and version == INDEX_VERSION and byte_order == _BYTE_ORDER
+            and size == source_stat.st_size and mtime_ns == source_stat.st_mtime_ns)
+
+
+def _is_complete(buffer):
+    """
+    Check that the body of an index matches its header.
+
+    Catches truncated or corrupt files behind a valid header (interrupted
+    write, partial copy), which would otherwise fail while a page is read.
+    """
+    header = _HEADER.unpack_from(buffer, 0)
+    coord_typecode, num_pages, num_entries = header[3], header[6], header[7]
+    if coord_typecode not in (b'h', b'i'):
+        return False
+    sections = list(zip(header[9::2], header[10::2]))
+    if any(offset < _HEADER.size or offset + length > len(buffer) for offset, length in sections):
+        return False
+    coord_size = array(coord_typecode.decode('ascii')).itemsize
+    expected_lengths = [num_pages * 12, num_entries * 4 * coord_size, num_entries,
+                        (num_entries + 1) * 4, num_entries * 4, num_pages * 4]
+    if [length for _, length in sections[:6]] != expected_lengths:
+        return False
+    # The last text offset must be the end of the text blob, and pages must stay within the entries
+    text_offsets = memoryview(buffer)[sections[3][0]:sections[3][0] + sections[3][1]].cast('I')
+    pages = memoryview(buffer)[sections[0][0]:sections[0][0] + sections[0][1]].cast('I')
+    try:
+        return (text_offsets[num_entries] == sections[7][1]
+                and all(pages[i * 3 + 1] + pages[i * 3 + 2] <= num_entries for i in range(num_pages)))
+    finally:
+        text_offsets.release()
+        pages.release()
+
+
+def _open_index(index_path, source_stat):
+    """Memory-map an up-to-date, complete index file, or return None."""
+    try:
+        with open(index_path, 'rb') as f:
+            if not _is_current(f, source_stat):
+                return None
+            mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        if _is_complete(mapped_file):
+            return IndexedMMD(mapped_file, mapped_file)
+    except (struct.error, ValueError, TypeError, IndexError):
+        pass
+    logger.warning(f"Index {index_path} is corrupt, rebuilding it")
+    mapped_file.close()
+    return None
+
+
+def load_mmd_index(mmd_path):
+    """
+    Load the parsed contents of an .mmd file through its binary index.
+
+    The sidecar index is (re)built when missing or when the source file's
+    size/mtime changed. If it cannot be written (e.g. read-only folder),
+    the freshly built index is served from memory.
+
+    Returns:
+        IndexedMMD: Mapping {page_num: [(bbox, text), ...]}
+    """
+    source_stat = os.stat(mmd_path)
+    index_path = get_index_path(mmd_path)
+
+    indexed = _open_index(index_path, source_stat)
+    if indexed is not None:
+        return indexed
+
+    data = build_index_bytes(mmd_path, source_stat)
+    tmp_path = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        logger.warning(f"Could not write index {index_path}: {e}")
+        return IndexedMMD(data)
+
+    indexed = _open_index(index_path, source_stat)
+    return indexed if indexed is not None else IndexedMMD(data)
@@ -1,63 +1,118 @@
 import re
-from typing import List, Tuple, Dict
+from typing import Iterable, Iterator, List, Tuple, Dict
 from pathlib import Path
 
 
-def parse_mmd_file(mmd_path: str) -> Dict[int, List[Tuple[List[int], str]]]:
+PAGE_SPLIT = '<--- Page Split --->'
+
+# Bounding box pattern: <|det|>[[x1, y1, x2, y2]]<|/det|>
+DET_PATTERN = re.compile(r'<\|det\|>\[\[(\d+),\s*(\d+),\s*(\d+),\s*(\d+)\]\]<\|/det\|>')
+# Layout category pattern: <|ref|>category<|/ref|> (title, text, sub_title, table, ...)
+REF_PATTERN = re.compile(r'<\|ref\|>(.*?)<\|/ref\|>')
+
+
+# Sentinel emitted between pages by _iter_lines
+_PAGE_BREAK = object()
+# Line prefixes that close the current bounding box
+_BBOX_PREFIXES = ('<|ref|>', '<|det|>')
+
+
+def _iter_lines(lines: Iterable[str]) -> Iterator:
+    """Yield stripped lines, with _PAGE_BREAK wherever a page separator occurs."""
+    for line in lines:
+        if PAGE_SPLIT in line:
+            # Page separators may appear in the middle of a line
+            segments = line.split(PAGE_SPLIT)
+            yield segments[0].strip()
+            for segment in segments[1:]:
+                yield _PAGE_BREAK
+                yield segment.strip()
+        else:
+            yield line.strip()
+
+
+def _iter_pages(lines: Iterable[str], include_category: bool = False) -> Iterator[Tuple[int, list]]:
+    """
+    Single-pass tokenizer over the lines of an .mmd document.
+
+    Every bbox collects the text lines that follow it until the next
+    <|ref|>/<|det|> line; bboxes without text and pages without bboxes are
+    dropped. Yields (page_num, bboxes) as soon as each page is complete.
+    """
+    page_num = 1
+    bboxes = []
+    bbox = None
+    category = None
+    last_category = None
+    text_lines = []
+
+    for line in _iter_lines(lines):
+        if bbox is not None:
+            if line is not _PAGE_BREAK and not line.startswith(_BBOX_PREFIXES):
+                # Collect non-empty text lines
+                if line and not line.startswith('<|'):
+                    text_lines.append(line)
+                continue
+            # Another bounding box (or page) starts: close the current one
+            if text_lines:
+                # Join all text lines with spaces
+                text = ' '.join(text_lines)
+                bboxes.append((bbox, text, category) if include_category else (bbox, text))
+                text_lines = []
+            bbox = None
+
+        if line is _PAGE_BREAK:
+            if bboxes:
+                yield page_num, bboxes
+                bboxes = []
+            page_num += 1
+            last_category = None
+            continue
+
+        if '<|' not in line:
+            continue
+        if '<|ref|>' in line:
+            ref_match = REF_PATTERN.search(line)
+            if ref_match:
+                last_category = ref_match.group(1)
+        if '<|det|>' in line:
+            bbox_match = DET_PATTERN.search(line)
+            if bbox_match:
+                bbox = [int(c) for c in bbox_match.groups()]
+                category = last_category
+                last_category = None
+
+    if bbox is not None and text_lines:
+        text = ' '.join(text_lines)
+        bboxes.append((bbox, text, category) if include_category else (bbox, text))
+    if bboxes:
+        yield page_num, bboxes
+
+
+def iter_mmd_pages(mmd_path: str, include_category: bool = False) -> Iterator[Tuple[int, list]]:
+    """
+    Stream an .mmd file line by line in a single pass, lazily yielding
+    (page_num, bboxes) for every page that has at least one bounding box.
+
+    Each bbox entry is a (bounding_box, text) tuple, or a
+    (bounding_box, text, category) tuple when include_category is True,
+    where category is the <|ref|> layout label (title, text, sub_title, table, ...).
+    """
+    with open(mmd_path, 'r', encoding='utf-8') as f:
+        yield from _iter_pages(f, include_category)
+
+
+def parse_mmd_file(mmd_path: str, include_category: bool = False) -> Dict[int, List[Tuple[List[int], str]]]:
     """
-    Parse .mmd file and return a dictionary mapping page numbers to 
+    Parse .mmd file and return a dictionary mapping page numbers to
     list of (bounding_box, text) tuples.
-    
+
+    Args:
+        mmd_path: Path to the .mmd file
+        include_category: Return (bounding_box, text, category) tuples instead,
+            keeping the <|ref|> layout category of each bbox
+
     Returns:
         Dict[int, List[Tuple[List[int], str]]]: {page_num: [(bbox, text), ...]}
     """
-    with open(mmd_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Split by page separators
-    pages = content.split('<--- Page Split --->')
-    
-    result = {}
-    for page_num, page_content in enumerate(pages, start=1):
-        lines = page_content.strip().split('\n')
-        bboxes = []
-        
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            
-            # Look for bounding box pattern: <|det|>[[x1, y1, x2, y2]]<|/det|>
-            bbox_match = re.search(r'<\|det\|>\[\[(\d+),\s*(\d+),\s*(\d+),\s*(\d+)\]\]<\|/det\|>', line)
-            
-            if bbox_match:
-                x1, y1, x2, y2 = map(int, bbox_match.groups())
-                bbox = [x1, y1, x2, y2]
-                
-                # Collect all text lines until the next bounding box or end
-                text_lines = []
-                j = i + 1
-                while j < len(lines):
-                    candidate = lines[j].strip()
-                    # Stop if we hit another bounding box line (ref or det marker)
-                    if candidate.startswith('<|ref|>') or candidate.startswith('<|det|>'):
-                        break
-                    # Collect non-empty text lines
-                    if candidate and not candidate.startswith('<|'):
-                        text_lines.append(candidate)
-                    j += 1
-                
-                # Join all text lines with spaces
-                text = ' '.join(text_lines) if text_lines else ""
-                
-                if text:
-                    bboxes.append((bbox, text))
-                    i = j  # Continue from where we stopped (next bbox or end)
-                    continue
-            
-            i += 1
-        
-        if bboxes:
-            result[page_num] = bboxes
-    
-    return result
-
+    return dict(iter_mmd_pages(mmd_path, include_category))
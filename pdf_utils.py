@@ -0,0 +1,121 @@
+"""
+PDF document handle pooling utility functions.
+"""
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import fitz  # PyMuPDF
+from loguru import logger
+import config
+
+
+class _PooledDocument:
+    """An open fitz.Document together with its pool bookkeeping."""
+
+    def __init__(self, doc, mtime_ns):
+        self.doc = doc
+        self.mtime_ns = mtime_ns
+        # fitz documents are not thread-safe: page access is serialized per document
+        self.lock = threading.Lock()
+        self.refcount = 0
+        self.last_used = time.monotonic()
+        self.retired = False
+
+
+class PDFDocumentPool:
+    """
+    Process-wide registry of open fitz.Document handles.
+
+    Each PDF is opened (and its xref parsed) once and shared by every caller.
+    Handles are reference counted while in use, reopened when the file's mtime
+    changes and closed after being idle for idle_timeout seconds or when more
+    than max_documents idle handles are open.
+    """
+
+    def __init__(self, idle_timeout, max_documents):
+        self.idle_timeout = idle_timeout
+        self.max_documents = max_documents
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def document(self, pdf_path):
+        """
+        Context manager yielding the shared fitz.Document for pdf_path.
+
+        The document is locked for the duration of the block, so callers can
+        load pages and render them without racing other threads.
+        """
+        resolved = Path(pdf_path).resolve()
+        key = str(resolved)
+        mtime_ns = resolved.stat().st_mtime_ns
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.mtime_ns != mtime_ns:
+                # The file changed on disk: stop handing out the old handle
+                self._retire(key, entry)
+                entry = None
+            if entry is None:
+                entry = _PooledDocument(fitz.open(key), mtime_ns)
+                self._entries[key] = entry
+            entry.refcount += 1
+            self._evict(now=time.monotonic())
+
+        try:
+            with entry.lock:
+                yield entry.doc
+        finally:
+            with self._lock:
+                entry.refcount -= 1
+                entry.last_used = time.monotonic()
+                if entry.retired and entry.refcount == 0:
+                    entry.doc.close()
+
+    def close_all(self):
+        """Close every handle that is not currently in use."""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                self._retire(key, entry)
+
+    def _retire(self, key, entry):
+        """Remove an entry from the registry, closing it once no caller holds it."""
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        entry.retired = True
+        if entry.refcount == 0:
+            entry.doc.close()
+
+    def _evict(self, now):
+        """Close idle handles past the timeout and trim the pool to max_documents."""
+        idle = sorted(
+            ((entry.last_used, key, entry) for key, entry in self._entries.items() if entry.refcount == 0),
+            key=lambda item: item[0]
+        )
+        excess = len(self._entries) - self.max_documents
+        for last_used, key, entry in idle:
+            if excess > 0 or now - last_used > self.idle_timeout:
+                logger.debug(f"Closing pooled PDF {key}")
+                self._retire(key, entry)
+                excess -= 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+_pool = PDFDocumentPool(config.PDF_POOL_IDLE_TIMEOUT, config.PDF_POOL_MAX_DOCUMENTS)
+atexit.register(_pool.close_all)
+
+
+def pdf_document(pdf_path):
+    """
+    Borrow the process-wide shared fitz.Document for a PDF file.
+
+    Usage:
+        with pdf_document(pdf_path) as pdf_doc:
+            page = pdf_doc[0]
+    """
+    return _pool.document(pdf_path)
@@ -0,0 +1,68 @@
+"""
+Background prefetching of bbox crops and page rasters.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+import config
+from image_utils import load_pdf_page_as_image, get_bbox_crop, is_bbox_crop_cached
+from tile_store import get_tile_name
+
+
+_executor = ThreadPoolExecutor(max_workers=config.PREFETCH_WORKERS, thread_name_prefix="prefetch")
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def _run_task(key, func, *args):
+    """Run a prefetch task, logging failures instead of raising them."""
+    try:
+        func(*args)
+    except Exception as e:
+        logger.warning(f"Prefetch failed for {key}: {e}")
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(key)
+
+
+def _schedule(key, func, *args):
+    """Submit a task unless an identical one is already queued or running."""
+    with _in_flight_lock:
+        if key in _in_flight:
+            return False
+        _in_flight.add(key)
+    _executor.submit(_run_task, key, func, *args)
+    return True
+
+
+def prefetch_next_bboxes(pdf_path, page_number, bboxes, current_bbox_num, next_page=None, ahead=None):
+    """
+    Prepare upcoming crops and the next page raster in the background.
+
+    The annotation loop almost always moves forward, so while box N is shown
+    the crops of boxes N+1..N+ahead are computed, and when those reach the end
+    of the page the next page is rasterized (unless crops are clip-rendered),
+    making the next rerun a cache hit.
+
+    Args:
+        pdf_path: Path to the PDF file
+        page_number: Page number being annotated (1-indexed)
+        bboxes: List of bbox coordinates of the page, in box order
+        current_bbox_num: Box currently shown (1-indexed)
+        next_page: Page number that follows page_number, if any
+        ahead: Number of boxes to prefetch (defaults to config.PREFETCH_AHEAD)
+    """
+    if ahead is None:
+        ahead = config.PREFETCH_AHEAD
+
+    upcoming = bboxes[current_bbox_num:current_bbox_num + ahead]
+    for bbox in upcoming:
+        if is_bbox_crop_cached(pdf_path, page_number, bbox) or get_tile_name(pdf_path, page_number, bbox):
+            continue
+        _schedule(('crop', str(pdf_path), page_number, tuple(bbox)),
+                  get_bbox_crop, pdf_path, page_number, bbox)
+
+    # Clip-rendered crops do not use the page raster, so there is nothing to prepare then
+    if next_page is not None and not config.CLIP_RENDERING and current_bbox_num + ahead >= len(bboxes):
+        _schedule(('page', str(pdf_path), next_page),
+                  load_pdf_page_as_image, pdf_path, next_page)
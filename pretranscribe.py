@@ -0,0 +1,151 @@
+"""
+Offline vision-LLM pre-transcription of whole documents.
+
+Sends the highlighted crop of every bbox of a document to the vision model
+and stores each transcription as an 'llm' suggestion in annotations.db (see
+suggestions.py), which the UI prefills. Crops are loaded exactly as the UI
+loads them (tile_store.load_bbox_crop), so both share transcription cache
+entries, and requests go through a CorrectionService (llm_service.py), so the
+job keeps to the same concurrency, rate limit and retry policy as the UI.
+The suggestions table doubles as the checkpoint: results are committed in
+small batches while the job runs, and boxes that already have a suggestion
+for their current text are skipped, so an interrupted run resumes where it
+stopped.
+
+Usage:
+    python pretranscribe.py parsed_docs/1940 [--workers 4] [--base-url http://localhost:8000/v1]
+"""
+import argparse
+import sys
+from concurrent.futures import wait, FIRST_COMPLETED
+from loguru import logger
+import config
+from api_utils import create_openrouter_client, get_encoding_stats
+from database import init_db, save_suggestions, get_page_suggestions
+from document_store import get_document
+from llm_service import CorrectionService, STATUS_DONE
+from suggestions import SOURCE_LLM, get_source_document, text_hash
+from tile_store import iter_documents, load_bbox_crop
+from text_utils import is_table
+
+
+# Number of finished boxes committed to the database at once
+CHECKPOINT_EVERY = 20
+
+
+def _pending_bboxes(mmd_path):
+    """
+    Yield (page_number, bbox_number, bbox, text) for every non-table bbox of a
+    document that has no 'llm' suggestion for its current text yet.
+    """
+    source_document = get_source_document(mmd_path)
+    for page_number, bboxes in get_document(mmd_path).items():
+        done = get_page_suggestions(source_document, page_number, SOURCE_LLM)
+        for bbox_number, (bbox, text) in enumerate(bboxes, start=1):
+            if is_table(text):
+                continue
+            suggestion = done.get(bbox_number)
+            if suggestion is not None and suggestion['text_hash'] == text_hash(text):
+                continue
+            yield page_number, bbox_number, bbox, text
+
+
+def pretranscribe_document(service, pdf_path, mmd_path, checkpoint_every=CHECKPOINT_EVERY):
+    """
+    Transcribe every pending bbox of a document and store the results as 'llm' suggestions.
+
+    Args:
+        service: CorrectionService running the requests
+        pdf_path: Path to the PDF file
+        mmd_path: Path to the _det.mmd file
+        checkpoint_every: Number of finished boxes committed at once
+
+    Returns:
+        tuple: (number of boxes transcribed, number of boxes that failed)
+    """
+    source_document = get_source_document(mmd_path)
+    pending = _pending_bboxes(mmd_path)
+    finished = []
+    transcribed = 0
+    failed = 0
+
+    def _checkpoint():
+        if finished:
+            save_suggestions(finished)
+            finished.clear()
+
+    in_flight = {}
+    try:
+        while True:
+            # Keep a bounded window of requests in flight instead of queueing the whole document
+            for page_number, bbox_number, bbox, text in pending:
+                key = (source_document, page_number, bbox_number)
+                future = service.submit(key, lambda page_number=page_number, bbox=bbox:
+                                        load_bbox_crop(pdf_path, page_number, bbox), force=True)
+                in_flight[future] = (key, text)
+                if len(in_flight) >= 2 * service.max_concurrency:
+                    break
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, text = in_flight.pop(future)
+                _, page_number, bbox_number = key
+                result = service.get(key)
+                service.discard(key)
+                if result is None or result['status'] != STATUS_DONE:
+                    failed += 1
+                    error = result['error'] if result is not None else "result lost"
+                    logger.error(f"{source_document} p{page_number} #{bbox_number}: {error}")
+                    continue
+                suggested_text = result['text']
+                finished.append({
+                    'source_document': source_document,
+                    'page_number': page_number,
+                    'bbox_number': bbox_number,
+                    'source': SOURCE_LLM,
+                    'text_hash': text_hash(text),
+                    'suggested_text': suggested_text,
+                    'changed': suggested_text != text,
+                })
+                transcribed += 1
+            if len(finished) >= checkpoint_every:
+                _checkpoint()
+                logger.info(f"{source_document}: {transcribed} boxes transcribed")
+    finally:
+        # Interrupted or not, keep what finished
+        for future in in_flight:
+            future.cancel()
+        _checkpoint()
+
+    return transcribed, failed
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Pre-transcribe every bbox of documents with the vision model.")
+    arg_parser.add_argument("paths", nargs="+", help="Year folders (parsed_docs/<year>) or _det.mmd files")
+    arg_parser.add_argument("--workers", type=int, default=config.LLM_MAX_CONCURRENCY, help="Concurrent requests")
+    arg_parser.add_argument("--base-url", default=None,
+                            help="API endpoint (default: OPENROUTER_BASE_URL), e.g. a local mock server")
+    arg_parser.add_argument("--api-key", default=None, help="API key (default: OPENROUTER_API_KEY)")
+    args = arg_parser.parse_args(argv)
+
+    client = create_openrouter_client(base_url=args.base_url, api_key=args.api_key)
+    if client is None:
+        logger.error("OpenRouter API key not found. Set OPENROUTER_API_KEY or pass --api-key.")
+        return 1
+
+    init_db()
+    service = CorrectionService(client_factory=lambda: client, max_concurrency=args.workers)
+    for pdf_path, mmd_path in iter_documents(args.paths):
+        transcribed, failed = pretranscribe_document(service, pdf_path, mmd_path)
+        logger.info(f"{mmd_path.name}: {transcribed} boxes transcribed, {failed} failed")
+    stats = get_encoding_stats()
+    logger.info(f"Payloads: {stats['crops']} crops, {stats['downsampled']} downsampled, "
+                f"{stats['avg_payload_bytes'] / 1024:.1f} KiB and {stats['avg_encode_ms']:.1f} ms on average")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
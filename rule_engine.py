@@ -0,0 +1,137 @@
+"""
+Rule-based correction utility functions.
+
+The replacement rules (config.RULES_DICT, {obtained word: corrected word})
+are compiled into a single regular expression built from a character trie
+of the rule keys, so a text is corrected in one pass whatever the number of
+rules. Matches are whole words only ("esse" does not match inside "esses"
+or "interesse"), the longest rule wins where keys share a prefix, and the
+lowercase, Capitalized and UPPERCASE variants of every rule are generated
+automatically (rules written explicitly take precedence over generated ones).
+"""
+import re
+import threading
+from typing import Dict
+import config
+from cache_utils import LRUCache
+
+
+def expand_case_variants(rules: Dict[str, str]) -> Dict[str, str]:
+    """
+    Add the lowercase, Capitalized and UPPERCASE variants of every rule.
+
+    Args:
+        rules: {obtained word: corrected word}
+
+    Returns:
+        Dict[str, str]: The expanded rules; explicit rules override generated variants
+    """
+    expanded = {}
+    for old, new in rules.items():
+        expanded[old.lower()] = new.lower()
+        expanded[old[:1].upper() + old[1:].lower()] = new[:1].upper() + new[1:].lower()
+        expanded[old.upper()] = new.upper()
+    expanded.update(rules)
+    return expanded
+
+
+def _trie_pattern(node) -> str:
+    """Build the regex of a trie node ({char: child node}, '' marks the end of a key)."""
+    is_end = '' in node
+    children = sorted((char, child) for char, child in node.items() if char != '')
+    if not children:
+        return ''
+
+    leaves = [char for char, child in children if len(child) == 1 and '' in child]
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in children
+                if not (len(child) == 1 and '' in child)]
+    # Longer continuations are tried first; single-character endings become a class
+    if len(leaves) == 1:
+        branches.append(re.escape(leaves[0]))
+    elif leaves:
+        branches.append('[' + ''.join(re.escape(char) for char in leaves) + ']')
+
+    if len(branches) == 1 and not is_end:
+        return branches[0]
+    pattern = '(?:' + '|'.join(branches) + ')'
+    # Greedy optional group: the longer key is tried before the shorter one ending here
+    return pattern + '?' if is_end else pattern
+
+
+def compile_rules(rules: Dict[str, str]) -> re.Pattern:
+    """
+    Compile rule keys into one whole-word regular expression.
+
+    Args:
+        rules: {obtained word: corrected word}
+
+    Returns:
+        re.Pattern: Pattern matching any rule key that is not part of a longer word
+    """
+    trie = {}
+    for key in rules:
+        if not key:
+            continue
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return re.compile(r'(?<!\w)' + _trie_pattern(trie) + r'(?!\w)')
+
+
+class RuleEngine:
+    """Compiled set of word replacement rules."""
+
+    def __init__(self, rules: Dict[str, str], case_variants: bool = True):
+        self.rules = expand_case_variants(rules) if case_variants else dict(rules)
+        self.pattern = compile_rules(self.rules) if self.rules else None
+
+    def _replace(self, match):
+        return self.rules[match.group(0)]
+
+    def apply(self, text: str) -> str:
+        """Apply every rule to text in a single pass."""
+        if not text or self.pattern is None:
+            return text
+        return self.pattern.sub(self._replace, text)
+
+    def __len__(self):
+        return len(self.rules)
+
+
+# Compiled engines shared by all sessions: {tuple of rules: RuleEngine}
+_engines = LRUCache(8)
+_engines_lock = threading.Lock()
+
+
+def get_rule_engine(rules: Dict[str, str] = None) -> RuleEngine:
+    """
+    Get the compiled engine of a rule set (config.RULES_DICT by default).
+
+    Engines are compiled once per process and recompiled only if the rules change.
+    """
+    if rules is None:
+        rules = config.RULES_DICT
+    key = tuple(rules.items())
+    engine = _engines.get(key)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = RuleEngine(rules)
+                _engines.put(key, engine)
+    return engine
+
+
+def apply_rules(text: str, rules: Dict[str, str] = None) -> str:
+    """
+    Apply the correction rules (config.RULES_DICT by default) to a text.
+
+    Args:
+        text: Text to correct
+        rules: Optional rule set to use instead of config.RULES_DICT
+
+    Returns:
+        str: Corrected text
+    """
+    return get_rule_engine(rules).apply(text)
@@ -0,0 +1,139 @@
+"""
+Precomputed per-bbox correction suggestions.
+
+Runs the compiled correction rules (rule_engine.py) over every bbox of a
+parsed document and stores the suggested text of each bbox, and whether the
+rules changed anything, in the suggestions table of annotations.db. The UI
+prefills the rule suggestion of the current box and can jump straight to the
+next box where the rules fired.
+
+Usage:
+    python suggestions.py parsed_docs/1940 [parsed_docs/1939 ...]
+"""
+import argparse
+import hashlib
+import sys
+from pathlib import Path
+from loguru import logger
+from database import init_db, save_suggestions, get_page_suggestions, get_changed_suggestions
+from document_store import get_document
+from rule_engine import get_rule_engine
+from text_utils import is_table
+
+
+# Suggestion sources (the tool that produced them)
+SOURCE_RULES = 'rules'
+SOURCE_LLM = 'llm'
+
+
+def text_hash(text):
+    """Return the hash identifying the OCR text a suggestion was computed from."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def get_source_document(mmd_path):
+    """Return the DR_DD_MM_YYYY name of a _det.mmd file."""
+    return Path(mmd_path).name.replace('_det.mmd', '')
+
+
+def build_rule_suggestions(mmd_path, rules=None):
+    """
+    Apply the correction rules to every bbox of a parsed document.
+
+    Tables are skipped, since the correction tools are not offered for them.
+
+    Args:
+        mmd_path: Path to the _det.mmd file
+        rules: Optional rule set to use instead of config.RULES_DICT
+
+    Returns:
+        list: Suggestion dicts ready for database.save_suggestions
+    """
+    engine = get_rule_engine(rules)
+    source_document = get_source_document(mmd_path)
+    suggestions = []
+    for page_number, bboxes in get_document(mmd_path).items():
+        for bbox_number, (_, text) in enumerate(bboxes, start=1):
+            if is_table(text):
+                continue
+            suggested_text = engine.apply(text)
+            suggestions.append({
+                'source_document': source_document,
+                'page_number': page_number,
+                'bbox_number': bbox_number,
+                'source': SOURCE_RULES,
+                'text_hash': text_hash(text),
+                'suggested_text': suggested_text,
+                'changed': suggested_text != text,
+            })
+    return suggestions
+
+
+def store_rule_suggestions(mmd_path, rules=None):
+    """
+    Compute and store the rule suggestions of a parsed document.
+
+    Returns:
+        tuple: (number of bboxes processed, number of bboxes changed by the rules)
+    """
+    suggestions = build_rule_suggestions(mmd_path, rules)
+    save_suggestions(suggestions)
+    return len(suggestions), sum(1 for s in suggestions if s['changed'])
+
+
+def get_bbox_suggestion(source_document, page_number, bbox_number, text, source=SOURCE_RULES):
+    """
+    Get the stored suggestion of a bbox, if it was computed from its current text.
+
+    Returns:
+        dict: The suggestion, or None
+    """
+    suggestion = get_page_suggestions(source_document, page_number, source).get(bbox_number)
+    if suggestion is None or suggestion['text_hash'] != text_hash(text):
+        return None
+    return suggestion
+
+
+def find_next_suggestion(document, source_document, page_number, bbox_number, source=SOURCE_RULES):
+    """
+    Find the next bbox after (page_number, bbox_number) whose text a tool changed.
+
+    Suggestions whose OCR text no longer matches the document are skipped.
+
+    Args:
+        document: The document_store.ParsedDocument of the source document
+
+    Returns:
+        tuple: (page_number, bbox_number), or None if there is no later suggestion
+    """
+    for suggestion in get_changed_suggestions(source_document, source):
+        position = (suggestion['page_number'], suggestion['bbox_number'])
+        if position <= (page_number, bbox_number) or position[0] not in document:
+            continue
+        bboxes = document.page(position[0])
+        if position[1] <= len(bboxes) and text_hash(bboxes[position[1] - 1][1]) == suggestion['text_hash']:
+            return position
+    return None
+
+
+def _iter_mmd_files(paths):
+    """Yield every _det.mmd file in the given year folders or files."""
+    for path in paths:
+        path = Path(path)
+        yield from sorted(path.glob("DR_*_det.mmd")) if path.is_dir() else [path]
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Precompute rule correction suggestions for every bbox.")
+    arg_parser.add_argument("paths", nargs="+", help="Year folders (parsed_docs/<year>) or _det.mmd files")
+    args = arg_parser.parse_args(argv)
+
+    init_db()
+    for mmd_path in _iter_mmd_files(args.paths):
+        processed, changed = store_rule_suggestions(mmd_path)
+        logger.info(f"{mmd_path.name}: {changed} of {processed} boxes changed by the rules")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Edit-distance alignment of token sequences and strings.
+
+Levenshtein distance computed over a diagonal band (Ukkonen): only cells
+within k of the diagonal are filled, the band is doubled until the distance
+fits in it, and the computation stops early as soon as a whole row exceeds
+the band. The common prefix and suffix are stripped first, so mostly correct
+OCR text only pays for the region that actually differs.
+
+Operations describe how to turn the first sequence (the obtained text) into
+the second one (the ground truth):
+    'equal'       token kept
+    'substitute'  obtained token replaced by a ground truth token
+    'delete'      obtained token removed (extra word in the OCR)
+    'insert'      ground truth token added (word missing from the OCR)
+"""
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+
+class Alignment(NamedTuple):
+    """Result of aligning two sequences."""
+    distance: int
+    # [(operation, obtained token or None, ground truth token or None), ...]
+    operations: List[Tuple[str, Optional[object], Optional[object]]]
+
+
+def _common_affixes(a: Sequence, b: Sequence) -> Tuple[int, int]:
+    """Return the lengths of the common prefix and suffix of a and b."""
+    limit = min(len(a), len(b))
+    prefix = 0
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    return prefix, suffix
+
+
+def _banded_rows(a: Sequence, b: Sequence, k: int, keep_rows: bool):
+    """
+    Fill the DP matrix of a vs b within the band |i - j| <= k.
+
+    Row i is stored as a list of 2k + 1 cells, cell d holding column j = i + d - k.
+
+    Returns:
+        tuple: (distance or None if it exceeds k, list of rows if keep_rows)
+    """
+    n, m = len(a), len(b)
+    inf = k + 1
+    width = 2 * k + 1
+    previous = [inf] * width
+    for d in range(k, min(width, k + m + 1)):
+        previous[d] = d - k
+    rows = [previous] if keep_rows else None
+
+    for i in range(1, n + 1):
+        current = [inf] * width
+        a_token = a[i - 1]
+        row_min = inf
+        for d in range(max(0, k - i), min(width, k + m - i + 1)):
+            j = i + d - k
+            if j == 0:
+                cost = i
+            else:
+                # diagonal: (i-1, j-1) is cell d of the previous row
+                cost = previous[d] + (a_token != b[j - 1])
+                # up: (i-1, j) is cell d + 1 of the previous row
+                if d + 1 < width and previous[d + 1] + 1 < cost:
+                    cost = previous[d + 1] + 1
+                # left: (i, j-1) is cell d - 1 of this row
+                if d > 0 and current[d - 1] + 1 < cost:
+                    cost = current[d - 1] + 1
+            if cost > inf:
+                cost = inf
+            current[d] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > k:
+            # Every path already costs more than the band allows
+            return None, rows
+        previous = current
+        if keep_rows:
+            rows.append(current)
+
+    distance = previous[m - n + k]
+    return (distance if distance <= k else None), rows
+
+
+def _traceback(a: Sequence, b: Sequence, k: int, rows) -> list:
+    """Recover the edit operations from the rows filled by _banded_rows."""
+    operations = []
+    i, j = len(a), len(b)
+    while i > 0 or j > 0:
+        d = j - i + k
+        cost = rows[i][d]
+        if i > 0 and j > 0 and rows[i - 1][d] + (a[i - 1] != b[j - 1]) == cost:
+            operations.append(('equal' if a[i - 1] == b[j - 1] else 'substitute', a[i - 1], b[j - 1]))
+            i, j = i - 1, j - 1
+        elif i > 0 and d + 1 < len(rows[i - 1]) and rows[i - 1][d + 1] + 1 == cost:
+            operations.append(('delete', a[i - 1], None))
+            i -= 1
+        else:
+            operations.append(('insert', None, b[j - 1]))
+            j -= 1
+    operations.reverse()
+    return operations
+
+
+def _distance_in_band(a: Sequence, b: Sequence, max_distance: Optional[int], keep_rows: bool):
+    """Run the banded DP, doubling the band until the distance fits (or exceeds max_distance)."""
+    k = max(1, abs(len(a) - len(b)))
+    if max_distance is not None:
+        k = min(k, max_distance)
+    while True:
+        distance, rows = _banded_rows(a, b, k, keep_rows)
+        if distance is not None:
+            return distance, k, rows
+        if max_distance is not None and k >= max_distance:
+            return None, k, None
+        k = min(2 * k, max(len(a), len(b)))
+        if max_distance is not None:
+            k = min(k, max_distance)
+
+
+def edit_distance(a: Sequence, b: Sequence, max_distance: Optional[int] = None) -> Optional[int]:
+    """
+    Levenshtein distance between two sequences (strings or token lists).
+
+    Args:
+        a: Obtained sequence
+        b: Ground truth sequence
+        max_distance: Stop early and return None once the distance is known to exceed this
+
+    Returns:
+        int: The distance, or None if it exceeds max_distance
+    """
+    prefix, suffix = _common_affixes(a, b)
+    a = a[prefix:len(a) - suffix]
+    b = b[prefix:len(b) - suffix]
+    if not a or not b:
+        distance = max(len(a), len(b))
+        return distance if max_distance is None or distance <= max_distance else None
+    if max_distance is not None and abs(len(a) - len(b)) > max_distance:
+        return None
+    distance, _, _ = _distance_in_band(a, b, max_distance, keep_rows=False)
+    return distance
+
+
+def align(a: Sequence, b: Sequence) -> Alignment:
+    """
+    Align two sequences, returning the distance and the edit operations.
+
+    Args:
+        a: Obtained sequence
+        b: Ground truth sequence
+    """
+    prefix, suffix = _common_affixes(a, b)
+    head = [('equal', token, token) for token in a[:prefix]]
+    tail = [('equal', token, token) for token in a[len(a) - suffix:]]
+    a_mid = a[prefix:len(a) - suffix]
+    b_mid = b[prefix:len(b) - suffix]
+
+    if not a_mid:
+        middle = [('insert', None, token) for token in b_mid]
+    elif not b_mid:
+        middle = [('delete', token, None) for token in a_mid]
+    else:
+        _, k, rows = _distance_in_band(a_mid, b_mid, None, keep_rows=True)
+        middle = _traceback(a_mid, b_mid, k, rows)
+
+    operations = head + middle + tail
+    distance = sum(1 for operation in middle if operation[0] != 'equal')
+    return Alignment(distance, operations)
+
+
+def error_rate(distance: int, reference_length: int) -> float:
+    """Edit distance relative to the length of the reference (WER/CER)."""
+    if reference_length == 0:
+        return 0.0 if distance == 0 else 1.0
+    return distance / reference_length
@@ -2,6 +2,8 @@
 Text processing utility functions.
 """
 import re as regex_module
+from functools import lru_cache
+from text_alignment import align, edit_distance, error_rate
 
 
 def is_table(text):
@@ -31,53 +33,100 @@ def count_words(text):
     return len(words)
 
 
+@lru_cache(maxsize=4096)
+def extract_words(text):
+    """
+    Return the words of a text as a tuple of lowercase tokens.
+
+    For tables (HTML format) the words of all cells are returned in order.
+    Results are memoized, since the same texts are scored repeatedly.
+    """
+    if not text:
+        return ()
+    if is_table(text):
+        cell_texts = regex_module.findall(r'<td>(.*?)</td>', text, regex_module.DOTALL)
+        text = ' '.join(cell_texts)
+    return tuple(word.lower() for word in regex_module.findall(r'\b\w+\b', text))
+
+
+def score_texts(obtained_text, ground_truth):
+    """
+    Align the words of the obtained text with the ground truth and score them.
+
+    Words are aligned with a real edit distance (text_alignment), so an
+    inserted or dropped word only counts once instead of shifting every word
+    after it. Comparisons are case-insensitive. The character distance is
+    refined from the word alignment: each run of differing words between two
+    matching words is compared character by character.
+
+    Returns:
+        dict: differing_words, substitutions, insertions, deletions,
+              obtained_words, reference_words, wer, differing_chars,
+              reference_chars, cer and the aligned operations
+    """
+    obtained_words = extract_words(obtained_text)
+    truth_words = extract_words(ground_truth)
+    alignment = align(obtained_words, truth_words)
+
+    counts = {'substitute': 0, 'insert': 0, 'delete': 0}
+    differing_chars = 0
+    obtained_run = []
+    truth_run = []
+    # Sentinel 'equal' operation closes the last run of differing words
+    for operation, obtained_word, truth_word in alignment.operations + [('equal', None, None)]:
+        if operation != 'equal':
+            counts[operation] += 1
+            if obtained_word is not None:
+                obtained_run.append(obtained_word)
+            if truth_word is not None:
+                truth_run.append(truth_word)
+        elif obtained_run or truth_run:
+            differing_chars += edit_distance(' '.join(obtained_run), ' '.join(truth_run))
+            obtained_run = []
+            truth_run = []
+
+    reference_chars = len(' '.join(truth_words))
+    return {
+        'differing_words': alignment.distance,
+        'substitutions': counts['substitute'],
+        'insertions': counts['insert'],
+        'deletions': counts['delete'],
+        'obtained_words': len(obtained_words),
+        'reference_words': len(truth_words),
+        'wer': error_rate(alignment.distance, len(truth_words)),
+        'differing_chars': differing_chars,
+        'reference_chars': reference_chars,
+        'cer': error_rate(differing_chars, reference_chars),
+        'operations': alignment.operations,
+    }
+
+
+def score_errors(errors):
+    """
+    Score a batch of error annotations (dicts with text_with_error and ground_truth).
+
+    Identical (obtained, ground truth) pairs are only aligned once.
+
+    Returns:
+        list: One score_texts dict per error, in the same order
+    """
+    scores = {}
+    results = []
+    for error in errors:
+        pair = (error['text_with_error'], error['ground_truth'])
+        if pair not in scores:
+            scores[pair] = score_texts(*pair)
+        results.append(scores[pair])
+    return results
+
+
 def count_differing_words(obtained_text, ground_truth):
-    """Count the number of words that differ between obtained text and ground truth."""
+    """
+    Count the number of words that differ between obtained text and ground truth.
+
+    This is the word-level edit distance (substitutions + insertions + deletions,
+    case-insensitive); for tables the words of all cells are aligned in order.
+    """
     if not obtained_text or not ground_truth:
         return 0
-    
-    # Handle tables - if both are tables, we need to compare cell by cell
-    if is_table(obtained_text) and is_table(ground_truth):
-        # Extract cells from both tables
-        obtained_cells = regex_module.findall(r'<td>(.*?)</td>', obtained_text, regex_module.DOTALL)
-        ground_truth_cells = regex_module.findall(r'<td>(.*?)</td>', ground_truth, regex_module.DOTALL)
-        
-        # Compare corresponding cells
-        differing_words = 0
-        max_len = max(len(obtained_cells), len(ground_truth_cells))
-        for i in range(max_len):
-            obtained_cell = obtained_cells[i].strip() if i < len(obtained_cells) else ""
-            truth_cell = ground_truth_cells[i].strip() if i < len(ground_truth_cells) else ""
-            
-            # Get words from each cell
-            obtained_words = regex_module.findall(r'\b\w+\b', obtained_cell)
-            truth_words = regex_module.findall(r'\b\w+\b', truth_cell)
-            
-            # Count words that differ (using simple alignment)
-            differing_words += abs(len(obtained_words) - len(truth_words))
-            # Also check word-by-word differences (simplified - just count different lengths or positions)
-            min_len = min(len(obtained_words), len(truth_words))
-            for j in range(min_len):
-                if obtained_words[j].lower() != truth_words[j].lower():
-                    differing_words += 1
-        
-        return differing_words
-    else:
-        # Regular text comparison
-        obtained_words = regex_module.findall(r'\b\w+\b', obtained_text)
-        truth_words = regex_module.findall(r'\b\w+\b', ground_truth)
-        
-        # Count differing words using sequence alignment approach
-        # Simple approach: count words in the shorter sequence that don't match
-        differing_words = 0
-        min_len = min(len(obtained_words), len(truth_words))
-        
-        for i in range(min_len):
-            if obtained_words[i].lower() != truth_words[i].lower():
-                differing_words += 1
-        
-        # Add difference in length as additional differing words
-        differing_words += abs(len(obtained_words) - len(truth_words))
-        
-        return differing_words
-
+    return edit_distance(extract_words(obtained_text), extract_words(ground_truth))
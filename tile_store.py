@@ -0,0 +1,263 @@
+"""
+Precomputed, pre-annotated bbox crop tiles.
+
+Renders every bbox crop of a document up front and stores the encoded tiles
+in a content-addressed directory next to the _det.mmd file:
+
+    parsed_docs/<year>/DR_DD_MM_YYYY_tiles/
+        manifest.json      # {page: {"x1,y1,x2,y2": "<sha256>.webp"}} + render settings
+        <sha256>.webp      # tile bytes, named by their own hash
+
+Usage:
+    python tile_store.py parsed_docs/1940 [--format WEBP] [--quality 85] [--workers 8]
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from loguru import logger
+from PIL import Image
+import config
+from cache_utils import LRUCache
+from parser import parse_mmd_file
+from image_utils import load_pdf_page_as_image, crop_and_highlight_bbox, render_bbox_crop, get_bbox_crop
+
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+TILE_MIME_TYPES = {
+    "WEBP": "image/webp",
+    "JPEG": "image/jpeg",
+}
+
+# Loaded manifests: {manifest path: (manifest mtime, manifest)}
+_manifest_cache = LRUCache(32)
+
+
+def get_tiles_dir(pdf_path):
+    """Return the tile directory of a document (DR_DD_MM_YYYY_tiles next to its files)."""
+    pdf_path = Path(pdf_path)
+    return pdf_path.parent / f"{pdf_path.stem}{config.TILES_DIR_SUFFIX}"
+
+
+def _bbox_key(bbox):
+    """Serialize bbox coordinates to the manifest key format."""
+    return ",".join(str(int(c)) for c in bbox)
+
+
+def _render_settings(pdf_path, tile_format, quality):
+    """
+    Settings a tile set depends on; tiles are stale when any of them change.
+
+    These mirror the settings get_bbox_crop renders with, so tiles always
+    hold the crop the UI would render itself.
+    """
+    return {
+        'version': MANIFEST_VERSION,
+        'pdf_mtime_ns': Path(pdf_path).stat().st_mtime_ns,
+        'dpi': config.TARGET_DPI,
+        'clip_rendering': config.CLIP_RENDERING,
+        'clip_render_dpi': config.CLIP_RENDER_DPI,
+        'scan_extraction': config.SCAN_EXTRACTION,
+        'padding': config.CROP_PADDING,
+        'overlay_color': list(config.BBOX_OVERLAY_COLOR),
+        'offset': [config.OFFSET_X, config.OFFSET_Y],
+        'format': tile_format,
+        'quality': quality,
+    }
+
+
+def _encode_tile(img, tile_format, quality):
+    """Encode a crop to tile bytes."""
+    buffered = io.BytesIO()
+    img.save(buffered, format=tile_format, quality=quality)
+    return buffered.getvalue()
+
+
+def _tile_page(pdf_path, page_number, bboxes, tiles_dir, tile_format, quality):
+    """
+    Render the crops of one page and write the tiles of all its bboxes (runs in a worker process).
+
+    Crops are rendered like get_bbox_crop renders them: with
+    config.CLIP_RENDERING each box is rasterized on its own (render_bbox_crop),
+    otherwise it is cut from the rendered page.
+
+    Returns:
+        tuple: (page_number, {bbox key: tile file name})
+    """
+    if config.CLIP_RENDERING:
+        render_crop = lambda bbox: render_bbox_crop(pdf_path, page_number, bbox)
+    else:
+        img, img_metadata = load_pdf_page_as_image(pdf_path, page_number)
+        render_crop = lambda bbox: crop_and_highlight_bbox(img, bbox, img_metadata)
+    extension = tile_format.lower()
+    page_tiles = {}
+    for bbox in bboxes:
+        crop = render_crop(bbox)
+        data = _encode_tile(crop, tile_format, quality)
+        file_name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        tile_path = Path(tiles_dir) / file_name
+        if not tile_path.exists():
+            tmp_path = tile_path.with_name(f"{file_name}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, tile_path)
+        page_tiles[_bbox_key(bbox)] = file_name
+    return page_number, page_tiles
+
+
+def build_document_tiles(pdf_path, mmd_path, tile_format=None, quality=None, workers=None):
+    """
+    Render and store the tiles of every bbox of a document.
+
+    Pages are distributed over a process pool, so a whole issue is tiled
+    on all cores.
+
+    Args:
+        pdf_path: Path to the PDF file
+        mmd_path: Path to the _det.mmd file with the bboxes
+        tile_format: PIL format of the tiles (defaults to config.TILE_FORMAT)
+        quality: Encoder quality (defaults to config.TILE_QUALITY)
+        workers: Number of worker processes (defaults to the number of CPUs)
+
+    Returns:
+        Path: The tile directory
+    """
+    tile_format = (tile_format or config.TILE_FORMAT).upper()
+    if tile_format not in TILE_MIME_TYPES:
+        raise ValueError(f"Unsupported tile format: {tile_format}")
+    if quality is None:
+        quality = config.TILE_QUALITY
+
+    tiles_dir = get_tiles_dir(pdf_path)
+    tiles_dir.mkdir(parents=True, exist_ok=True)
+    parsed_data = parse_mmd_file(str(mmd_path))
+    manifest = _render_settings(pdf_path, tile_format, quality)
+    manifest['tiles'] = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_tile_page, str(pdf_path), page_number, [bbox for bbox, _ in bboxes],
+                            str(tiles_dir), tile_format, quality)
+            for page_number, bboxes in sorted(parsed_data.items())
+        ]
+        for future in futures:
+            page_number, page_tiles = future.result()
+            manifest['tiles'][str(page_number)] = page_tiles
+            logger.info(f"{Path(pdf_path).stem}: page {page_number} tiled ({len(page_tiles)} boxes)")
+
+    # Drop tiles no longer referenced by the manifest (e.g. after a re-render)
+    referenced = {name for page_tiles in manifest['tiles'].values() for name in page_tiles.values()}
+    for tile_path in tiles_dir.glob(f"*.{tile_format.lower()}"):
+        if tile_path.name not in referenced:
+            tile_path.unlink()
+
+    tmp_path = tiles_dir / f"{MANIFEST_NAME}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, tiles_dir / MANIFEST_NAME)
+
+    return tiles_dir
+
+
+def _load_manifest(pdf_path):
+    """Load the tile manifest of a document, or None if missing or stale."""
+    manifest_path = get_tiles_dir(pdf_path) / MANIFEST_NAME
+    try:
+        manifest_mtime = manifest_path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+    cached = _manifest_cache.get(str(manifest_path))
+    if cached is not None and cached[0] == manifest_mtime:
+        manifest = cached[1]
+    else:
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        _manifest_cache.put(str(manifest_path), (manifest_mtime, manifest))
+
+    expected = _render_settings(pdf_path, manifest.get('format'), manifest.get('quality'))
+    if any(manifest.get(name) != value for name, value in expected.items()):
+        return None
+    return manifest
+
+
+def get_tile_name(pdf_path, page_number, bbox):
+    """Return the tile file name of a bbox, or None if it has not been tiled."""
+    manifest = _load_manifest(pdf_path)
+    if manifest is None:
+        return None
+    return manifest['tiles'].get(str(page_number), {}).get(_bbox_key(bbox))
+
+
+def load_tile(pdf_path, page_number, bbox):
+    """
+    Load the precomputed tile of a bbox.
+
+    Returns:
+        tuple: (tile bytes, mime type), or None if no up-to-date tile exists
+    """
+    file_name = get_tile_name(pdf_path, page_number, bbox)
+    if file_name is None:
+        return None
+    try:
+        data = (get_tiles_dir(pdf_path) / file_name).read_bytes()
+    except OSError:
+        return None
+    extension = file_name.rsplit('.', 1)[-1].upper()
+    return data, TILE_MIME_TYPES.get(extension, "image/jpeg")
+
+
+def load_bbox_crop(pdf_path, page_number, bbox):
+    """
+    Load the highlighted crop of a bbox, from its precomputed tile when there is one.
+
+    This is the crop the UI shows and sends to the vision model, so every
+    caller that encodes it produces the same bytes (and transcription cache keys).
+
+    Returns:
+        PIL Image: The crop
+    """
+    tile = load_tile(pdf_path, page_number, bbox)
+    if tile:
+        return Image.open(io.BytesIO(tile[0]))
+    return get_bbox_crop(pdf_path, page_number, bbox)
+
+
+def iter_documents(paths):
+    """Yield (pdf_path, mmd_path) for every document in the given year folders or files."""
+    for path in paths:
+        path = Path(path)
+        mmd_files = sorted(path.glob("DR_*_det.mmd")) if path.is_dir() else [path]
+        for mmd_path in mmd_files:
+            pdf_path = mmd_path.with_name(mmd_path.name.replace('_det.mmd', '.pdf'))
+            if not pdf_path.exists():
+                logger.warning(f"Skipping {mmd_path.name}: {pdf_path.name} not found")
+                continue
+            yield pdf_path, mmd_path
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Precompute highlighted bbox crop tiles.")
+    arg_parser.add_argument("paths", nargs="+", help="Year folders (parsed_docs/<year>) or _det.mmd files")
+    arg_parser.add_argument("--format", default=config.TILE_FORMAT, choices=sorted(TILE_MIME_TYPES),
+                            help="Tile image format")
+    arg_parser.add_argument("--quality", type=int, default=config.TILE_QUALITY, help="Encoder quality")
+    arg_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all CPUs)")
+    args = arg_parser.parse_args(argv)
+
+    for pdf_path, mmd_path in iter_documents(args.paths):
+        tiles_dir = build_document_tiles(pdf_path, mmd_path, args.format, args.quality, args.workers)
+        logger.info(f"Tiles written to {tiles_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())